@@ -1,11 +1,20 @@
 import streamlit as st
-import pandas as pd
 import os
-import google.generativeai as genai
 import base64
-import re
-from indic_transliteration import sanscript
-from indic_transliteration.sanscript import transliterate
+
+import catalog
+import chat_history
+import llm_guard
+import llm_providers
+import prompt_builder
+import recipe_cost
+import recipe_memory
+import recipe_names
+import recipe_parser
+import recipe_quality
+import recipe_store
+import single_flight
+import turn_metrics
 
 # --- Setup ---
 SCRIPT_DIR = os.path.dirname(__file__)
@@ -13,107 +22,21 @@ DATA_DIR = os.path.join(SCRIPT_DIR, "data")
 os.makedirs(DATA_DIR, exist_ok=True)
 
 EXCEL_FILE = os.path.join(DATA_DIR, "Recipebase.xlsx")
+DB_FILE = os.path.join(DATA_DIR, "Recipebase.db")
+SKU_CACHE_FILE = os.path.join(DATA_DIR, "sku_resolutions.db")
 logo_path = os.path.join(DATA_DIR, "Lifecode_Logo.png")
 
-APPROVED_SKU_LIST = [
-    "Almonds (Whole)", "Sunflower Seed (Whole)", "Pumpkin Seed (Whole)",
-    "Black Raisins (Whole)", "Cashew (Whole)", "Dates (Whole)", "Raisins (Whole)",
-    "Walnut (Whole)", "Toor Dal Arhar Split", "Black Pepper (Whole)", "Turmeric",
-    "Cold Pressed Sesame Oil White", "Mustard (Whole)", "Cumin (Whole)", "Dry Red Chilli",
-    "Garlic", "Curry Leaves", "Coriander Leaves", "Salt", "Water"
-]
+# --- Approved SKUs & Prices ---
+# From data/catalog.json (catalog.py); a new catalog version is picked up on rerun
+CATALOG = catalog.get("core")
+APPROVED_SKU_LIST = CATALOG.skus
+PRICE_DICT = CATALOG.prices
 
-PRICE_DICT = {
-    "Almonds (Whole)": 940, "Sunflower Seed (Whole)": 130, "Pumpkin Seed (Whole)": 530,
-    "Black Raisins (Whole)": 195, "Cashew (Whole)": 1000, "Dates (Whole)": 250,
-    "Raisins (Whole)": 195, "Walnut (Whole)": 1370, "Toor Dal Arhar Split": 155,
-    "Black Pepper (Whole)": 950, "Turmeric": 210, "Cold Pressed Sesame Oil White": 310,
-    "Mustard (Whole)": 120, "Cumin (Whole)": 365, "Dry Red Chilli": 320,
-    "Garlic": 0, "Curry Leaves": 0, "Coriander Leaves": 0, "Salt": 0, "Water": 0
-}
-
-# --- Helpers ---
-def get_base64_image(path):
-    if os.path.exists(path):
-        with open(path, "rb") as f:
-            return base64.b64encode(f.read()).decode("utf-8")
-    return ""
-
-def normalize_recipe_name(name):
-    try:
-        return transliterate(name.strip().lower(), sanscript.ITRANS, sanscript.TAMIL).strip()
-    except:
-        return name.strip().lower()
-
-# --- Excel Handling ---
-def load_memory():
-    try:
-        df = pd.read_excel(EXCEL_FILE)
-        if "Recipe_Name_Tamil" not in df.columns:
-            df["Recipe_Name_Tamil"] = df["Recipe_Name"].apply(normalize_recipe_name)
-        return df
-    except FileNotFoundError:
-        return pd.DataFrame(columns=[
-            "Recipe_Name", "Recipe_Name_Tamil", "Standard_Portion_Assumed_(Per_Person)",
-            "Ingredients_(with_unit_quantity)", "Organic_Grocery_Required_(Per_Person)",
-            "Grocery_Didn’t_Match_(if_any)", "Suitable_Accompaniment_(if_any)",
-            "Total_Cost_(₹_Per_Person)", "Response"
-        ])
-
-def save_to_memory(df):
-    df.to_excel(EXCEL_FILE, index=False)
-
-# --- Validators ---
-def match_skus(ingredient_lines):
-    matched, unmatched = [], []
-    for line in ingredient_lines:
-        name = line.split("-")[0].strip() if "-" in line else line.strip()
-        (matched if name in APPROVED_SKU_LIST else unmatched).append(line)
-    return matched, unmatched
-
-def calculate_cost(matched_lines):
-    total = 0.0
-    for line in matched_lines:
-        if "-" not in line:
-            continue
-        try:
-            name, qty_unit = map(str.strip, line.split("-", 1))
-            qty_match = re.search(r'(\d+(\.\d+)?)\s*([a-zA-Z]+)', qty_unit)
-            if not qty_match:
-                continue
-            qty, unit = float(qty_match[1]), qty_match[3].lower()
-            price = PRICE_DICT.get(name, 0)
-            total += (price / 1000) * qty if unit in ["g", "ml"] else price * qty
-        except:
-            continue
-    return f"₹{total:.2f}"
-
-# --- Core Logic ---
-def get_recipe(dish_name, api_key):
-    df = load_memory()
-    input_tamil = normalize_recipe_name(dish_name)
-
-    if "Recipe_Name_Tamil" in df.columns:
-        match = df[df["Recipe_Name_Tamil"] == input_tamil]
-        if not match.empty:
-            return match.iloc[0], False
-
-    # Gemini fallback
-    approved_list = '\n'.join([f"• {item}" for item in APPROVED_SKU_LIST])
-    prices_text = '\n'.join([f"• {item} – ₹{PRICE_DICT[item]}/kg or /L" for item in PRICE_DICT])
-
-    prompt = f"""
+PROMPT_TEMPLATE = """
 You are a wise and experienced 60+ year old Chettinad chef working for a modern nutrition brand called Lifecode.
 Your task is to prepare precise traditional Tamil recipes using only the below grocery items and their prices.
 You must not invent new ingredients or use different names.
-====================
-📦 APPROVED INGREDIENTS
-====================
-{approved_list}
-====================
-💰 INGREDIENT PRICES
-====================
-{prices_text}
+{catalog}
 ====================
 🎯 OUTPUT FORMAT (MUST FOLLOW EXACTLY)
 ====================
@@ -137,60 +60,186 @@ Dish Name: {dish_name}
 Only use g/ml units. Never use cups, spoons, pinch, etc. Stick to the above SKU list only.
 """
 
+# --- Helpers ---
+def get_base64_image(path):
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return base64.b64encode(f.read()).decode("utf-8")
+    return ""
+
+def normalize_recipe_name(name):
+    # Memoized (bounded LRU); stored rows keep their key in the recipe store
+    return recipe_names.tamil_key(name)
+
+# --- Recipe Memory ---
+def load_memory():
+    store = recipe_store.get_store(DB_FILE, EXCEL_FILE)
+    # Stored costs follow the catalog version: re-priced in one pass when it changes
+    recipe_cost.ensure_priced(store, CATALOG, "weighted", SKU_CACHE_FILE)
+    return recipe_memory.load_memory(store)
+
+def save_to_memory(row):
+    return recipe_store.get_store(DB_FILE, EXCEL_FILE).append(row)
+
+# --- Validators ---
+def match_skus(ingredient_lines):
+    return recipe_cost.match_skus(ingredient_lines, APPROVED_SKU_LIST, SKU_CACHE_FILE, CATALOG.fingerprint)
+
+def calculate_cost(matched_lines):
+    return recipe_cost.calculate_cost(matched_lines, PRICE_DICT)
+
+def cost_fields(matched_lines):
+    rows = recipe_cost.weighted_rows(matched_lines)
+    return recipe_cost.cost_fields("weighted", recipe_cost.total_weighted(rows, PRICE_DICT), rows)
+
+# --- Core Logic ---
+def get_recipe(dish_name, api_key):
+    with turn_metrics.span("load_memory"):
+        memory = load_memory()
+    with turn_metrics.span("lookup"):
+        input_tamil = normalize_recipe_name(dish_name)
+        match = memory.find("__Recipe_Tamil_Key", input_tamil)
+        if match is None:
+            # Any other spelling (English, Tanglish, Tamil script) seen for the dish
+            match = memory.find_alias(dish_name)
+    if match is not None:
+        turn_metrics.mark("memory")
+        return match, False
+
+    # Sessions asking for the same dish at once share one Gemini generation;
+    # its messages are drawn by every session that waited for it
+    with turn_metrics.span("generate"):
+        result, _ = single_flight.GENERATIONS.do(("app", input_tamil), lambda: generate_recipe(dish_name, api_key, input_tamil))
+    row, is_new, notices = result
+    for kind, text in notices:
+        getattr(st, kind)(text)
+    turn_metrics.mark("generated" if is_new else "memory_only" if row is not None else "failed")
+    return row, is_new
+
+def closest_recipe(input_tamil, notices):
+    # Memory only while Gemini is degraded: fall back to the closest stored dish
+    similar = load_memory().find_similar("__Recipe_Tamil_Key", input_tamil)
+    if similar is None:
+        return None, False, notices
+    notices.append(("warning", f"Showing the closest recipe I remember: {similar[0]['Recipe_Name']}"))
+    return similar[0], False, notices
+
+def generate_recipe(dish_name, api_key, input_tamil):
+    # Runs as the single-flight leader, so it never draws anything itself:
+    # returns (row, generated, [(st method, message), ...]) for every caller
+    notices = []
+    # Another session may have stored this dish while we were queued
+    memory = load_memory()
+    with turn_metrics.span("lookup"):
+        match = memory.find("__Recipe_Tamil_Key", input_tamil)
+        if match is None:
+            match = memory.find_alias(dish_name)
+    if match is not None:
+        return match, False, notices
+
+    # A dish that just failed waits out its negative-cache entry
+    failure_key = ("app", input_tamil)
     try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel(model_name="gemini-1.5-flash")
-        chat = model.start_chat()
-        result = chat.send_message(prompt)
-        response = result.text or result.candidates[0].content.parts[0].text
-    except Exception as e:
-        st.error(f"❌ Gemini call failed: {e}")
-        return None, False
-
-    column_mapping = {
-        "1. Recipe Name": "Recipe_Name",
-        "2. Standard Portion Assumed": "Standard_Portion_Assumed_(Per_Person)",
-        "3. Ingredients": "Ingredients_(with_unit_quantity)",
-        "4. Organic Grocery Required": "Organic_Grocery_Required_(Per_Person)",
-        "5. Grocery Didn’t Match": "Grocery_Didn’t_Match_(if_any)",
-        "6. Suitable Accompaniment": "Suitable_Accompaniment_(if_any)",
-        "7. Total Cost": "Total_Cost_(₹_Per_Person)",
-        "8. Response": "Response"
-    }
-
-    parsed_data, current_key, current_lines = {}, None, []
-    lines = response.strip().splitlines()
-    heading_pattern = re.compile(r"^\s*(\d+\.\s*[A-Za-z\s’‘“”()]+):\s*(.*)")
-
-    for line in lines:
-        match = heading_pattern.match(line.strip())
-        if match:
-            if current_key:
-                parsed_data[current_key] = "\n".join(current_lines).strip()
-            heading = match.group(1).strip()
-            content = match.group(2).strip()
-            current_key = column_mapping.get(heading, heading)
-            current_lines = [content]
-        else:
-            current_lines.append(line.strip())
-
-    if current_key:
-        parsed_data[current_key] = "\n".join(current_lines).strip()
-
-    final_values = {col: "" for col in df.columns}
+        recipe_quality.FAILURES.check(failure_key, dish_name)
+    except recipe_quality.RecipeRejected as e:
+        notices.append(("error", f"❌ {e}"))
+        return closest_recipe(input_tamil, notices)
+
+    # Gemini fallback (catalog part of the prompt is compiled once per catalog version)
+    prompt, stats = prompt_builder.compile_prompt(PROMPT_TEMPLATE, APPROVED_SKU_LIST, PRICE_DICT, version=CATALOG.tag).render_with_stats(dish_name)
+    print(f"[PROMPT] {dish_name}: {stats['chars']} chars, ~{stats['est_tokens']} tokens")
+
+    try:
+        provider = llm_providers.get_provider(
+            "gemini", stub_format="numbered", api_key=api_key, model_name="gemini-1.5-flash", transport="grpc"
+        )
+        with turn_metrics.span("llm"):
+            response = llm_providers.generate(provider, prompt, dish_name, json_mode=True)
+    except llm_guard.LLMUnavailable as e:
+        notices.append(("error", f"❌ Gemini call failed: {e}"))
+        if not isinstance(e, llm_guard.CircuitOpen):
+            recipe_quality.FAILURES.add(failure_key, str(e))
+        return closest_recipe(input_tamil, notices)
+
+    with turn_metrics.span("parse"):
+        parsed_data = recipe_parser.parse_numbered_response(response)
+    missing = parsed_data.pop("__missing_fields")
+    if missing:
+        notices.append(("caption", f"⚠️ Gemini's answer had no {', '.join(missing)}"))
+
+    final_values = {col: "" for col in recipe_store.RECIPE_COLUMNS + ["Recipe_Name_Tamil"]}
     final_values.update(parsed_data)
     final_values["Recipe_Name"] = dish_name
     final_values["Recipe_Name_Tamil"] = input_tamil
+    final_values["__aliases"] = [(input_tamil, "tamil")]
 
     ing_lines = final_values.get("Ingredients_(with_unit_quantity)", "").split("\n")
-    matched, unmatched = match_skus(ing_lines)
-    final_values["Organic_Grocery_Required_(Per_Person)"] = "\n".join(matched)
-    final_values["Grocery_Didn’t_Match_(if_any)"] = "\n".join(unmatched) if unmatched else "• Not applicable"
-    final_values["Total_Cost_(₹_Per_Person)"] = calculate_cost(matched)
+    with turn_metrics.span("sku_match"):
+        matched, unmatched = match_skus(ing_lines)
+        final_values["Organic_Grocery_Required_(Per_Person)"] = "\n".join(matched)
+        final_values["Grocery_Didn’t_Match_(if_any)"] = "\n".join(unmatched) if unmatched else "• Not applicable"
+        final_values["Total_Cost_(₹_Per_Person)"] = calculate_cost(matched)
+        final_values.update(cost_fields(matched))
+
+    # Only complete, plausibly priced recipes are saved
+    problems = recipe_quality.issues(missing, len([line for line in ing_lines if line.strip()]), final_values["__cost"])
+    if problems:
+        print(f"[QUALITY] {dish_name}: not saved ({', '.join(problems)})")
+        notices.append(("error", f"❌ Gemini's recipe was incomplete: {', '.join(problems)}"))
+        recipe_quality.FAILURES.add(failure_key, ", ".join(problems))
+        return closest_recipe(input_tamil, notices)
+    recipe_quality.FAILURES.clear(failure_key)
+
+    # An unsaved recipe is still served (as text) to everyone who waited
+    try:
+        with turn_metrics.span("save"):
+            final_values["__Recipe_Id"] = save_to_memory(final_values)
+    except Exception as e:
+        print(f"[SAVE] {dish_name}: {e}")
+        notices.append(("error", f"❌ Failed to save recipe: {e}"))
+    return final_values, True, notices
 
-    df = pd.concat([df, pd.DataFrame([final_values])], ignore_index=True)
-    save_to_memory(df)
-    return df.iloc[-1], True
+# --- Chat Cards ---
+CARD_BANNERS = {
+    "app:generated": "👨‍🍳 Freshly prepared by Lifecode Chef!",
+    "app:memory": "📒 Lifecode Chef remembered this one!",
+}
+CARD_COLUMNS = [
+    "Recipe_Name", "Standard_Portion_Assumed_(Per_Person)", "Ingredients_(with_unit_quantity)",
+    "Response", "Suitable_Accompaniment_(if_any)", "Total_Cost_(₹_Per_Person)",
+]
+
+def render_card(row, style):
+    msg = f"<p style='color:#007bff; font-style:italic;'>"
+    msg += CARD_BANNERS[style]
+    msg += "</p>\n\n"
+    msg += f"## {row['Recipe_Name']}\n\n"
+    msg += f"### Portion Details\n{row['Standard_Portion_Assumed_(Per_Person)']}\n\n"
+    msg += f"### Ingredients\n{row['Ingredients_(with_unit_quantity)']}\n\n"
+    msg += f"### Preparation Steps\n{row['Response']}\n\n"
+    if row['Suitable_Accompaniment_(if_any)'] not in ["", "Not applicable", "n/a"]:
+        msg += f"### Suitable Accompaniment\n{row['Suitable_Accompaniment_(if_any)']}\n\n"
+    msg += f"### Estimated Cost\n{row['Total_Cost_(₹_Per_Person)']}\n\n"
+    return msg
+
+def recipe_card(row, style, memory):
+    # Stored recipes go through the shared card cache (recipe_memory.CardCache)
+    return memory.card(row, style, lambda: render_card(row, style), CARD_COLUMNS)
+
+def add_message(entry):
+    chat_history.append(st.session_state.messages, entry)
+
+def show_history():
+    # Only the last RENDER_TURNS turns are drawn on each rerun
+    messages = st.session_state.messages
+    memory = load_memory() if chat_history.needs_memory(messages) else None
+    older, recent = chat_history.window(messages)
+    if older and st.checkbox(f"Show {len(older)} earlier messages", key="show_older_messages"):
+        recent = older + recent
+    for msg in recent:
+        with st.chat_message(msg["role"]):
+            st.markdown(chat_history.resolve(msg, memory, lambda row, style: recipe_card(row, style, memory)),
+                        unsafe_allow_html=True)
 
 # --- Streamlit UI ---
 st.set_page_config(page_title="🧬 Lifecode Recipe Generator", layout="centered")
@@ -198,37 +247,44 @@ st.title("🍛 Lifecode Recipe Generator")
 
 api_key = st.text_input("🔑 Enter your Gemini API Key:", type="password")
 
-if api_key:
+# The offline stub provider (CHEFBOT_LLM_PROVIDER=stub) needs no key
+if api_key or llm_providers.provider_kind("gemini") == "stub":
     if "messages" not in st.session_state:
         st.session_state.messages = []
 
-    for msg in st.session_state.messages:
-        with st.chat_message(msg["role"]):
-            st.markdown(msg["content"], unsafe_allow_html=True)
+    show_history()
 
     if user_input := st.chat_input("Which Tamil recipe would you like today?"):
-        st.session_state.messages.append({"role": "user", "content": user_input})
+        add_message(chat_history.text("user", user_input))
 
         with st.chat_message("user"):
             st.markdown(user_input)
 
         with st.chat_message("assistant"):
             with st.spinner("Sourcing wisdom from our traditional kitchens..."):
-                row, is_new = get_recipe(user_input, api_key)
+                with turn_metrics.turn("app", user_input.strip()) as chat_turn:
+                    st.session_state.last_turn = chat_turn
+                    row, is_new = get_recipe(user_input, api_key)
                 if row is None:
                     st.error("Could not retrieve recipe.")
                 else:
-                    msg = f"<p style='color:#007bff; font-style:italic;'>"
-                    msg += '👨‍🍳 Freshly prepared by Lifecode Chef!' if is_new else '📒 Lifecode Chef remembered this one!'
-                    msg += "</p>\n\n"
-                    msg += f"## {row['Recipe_Name']}\n\n"
-                    msg += f"### Portion Details\n{row['Standard_Portion_Assumed_(Per_Person)']}\n\n"
-                    msg += f"### Ingredients\n{row['Ingredients_(with_unit_quantity)']}\n\n"
-                    msg += f"### Preparation Steps\n{row['Response']}\n\n"
-                    if row['Suitable_Accompaniment_(if_any)'] not in ["", "Not applicable", "n/a"]:
-                        msg += f"### Suitable Accompaniment\n{row['Suitable_Accompaniment_(if_any)']}\n\n"
-                    msg += f"### Estimated Cost\n{row['Total_Cost_(₹_Per_Person)']}\n\n"
-                    st.markdown(msg, unsafe_allow_html=True)
-                    st.session_state.messages.append({"role": "assistant", "content": msg})
+                    style = "app:generated" if is_new else "app:memory"
+                    if row.get("__Recipe_Id") is not None:
+                        st.markdown(recipe_card(row, style, load_memory()), unsafe_allow_html=True)
+                        add_message(chat_history.recipe(row["__Recipe_Id"], style))
+                    else:
+                        # Not saved (the store write failed): keep the text itself
+                        msg = render_card(row, style)
+                        st.markdown(msg, unsafe_allow_html=True)
+                        add_message(chat_history.text("assistant", msg))
 else:
     st.info("Please enter your Gemini API key to begin.")
+
+# --- Timing Debug Panel ---
+with st.sidebar:
+    if st.checkbox("🔧 Show timing debug", key="timing_debug"):
+        if last_turn := st.session_state.get("last_turn"):
+            st.caption(f"Last turn: {last_turn.outcome or 'in progress'}, {last_turn.total_ms or 0:.0f} ms total")
+            st.table([{"stage": stage, "ms": round(ms, 1)} for stage, ms in last_turn.spans.items()])
+        st.caption("Per-stage latency (ms) across recent turns on this server")
+        st.table(turn_metrics.summary())
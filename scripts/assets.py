@@ -0,0 +1,97 @@
+# --- Imports ---
+import base64
+import hashlib
+import mimetypes
+import os
+import re
+import shutil
+import threading
+
+# --- Global Paths ---
+SCRIPT_DIR = os.path.dirname(__file__)
+DATA_DIR = os.path.join(SCRIPT_DIR, "data")
+CSS_FILE = os.path.join(SCRIPT_DIR, "style.css")
+LOGO_FILE = os.path.join(DATA_DIR, "Lifecode_Logo.png")
+# Streamlit serves <app dir>/static at app/static/ when
+# server.enableStaticServing is on; CHEFBOT_STATIC_ASSETS=1 says it is
+STATIC_DIR = os.path.join(SCRIPT_DIR, "static")
+STATIC_SERVING = os.environ.get("CHEFBOT_STATIC_ASSETS", "0") == "1"
+
+# --- Static Assets ---
+# The stylesheet and logo are read, minified and encoded once per process;
+# every rerun reuses the same strings. With static serving the logo is
+# published once as a content-hashed file and the page only carries its
+# URL; otherwise it is inlined as a (cached) data URI.
+CSS_COMMENT = re.compile(r"/\*.*?\*/", re.DOTALL)
+CSS_SPACE = re.compile(r"\s+")
+CSS_PUNCTUATION = re.compile(r"\s*([{}:;,>])\s*")
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def minify_css(css):
+    css = CSS_COMMENT.sub("", css)
+    css = CSS_SPACE.sub(" ", css)
+    css = CSS_PUNCTUATION.sub(r"\1", css)
+    return css.replace(";}", "}").strip()
+
+
+def _once(key, build):
+    value = _cache.get(key)
+    if value is None:
+        with _lock:
+            value = _cache.get(key)
+            if value is None:
+                value = build()
+                _cache[key] = value
+    return value
+
+
+def _read(path):
+    # (bytes, short content hash), or (None, None) when the file is missing
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        print(f"[ASSETS] Missing {path}")
+        return None, None
+    return data, hashlib.sha1(data).hexdigest()[:12]
+
+
+def style_tag(path=CSS_FILE):
+    # "<style>...</style>" for the page, "" when the stylesheet is missing
+    def build():
+        data, _ = _read(path)
+        return f"<style>{minify_css(data.decode('utf-8'))}</style>" if data is not None else ""
+    return _once(("css", path), build)
+
+
+def _publish(path, data, digest):
+    name, ext = os.path.splitext(os.path.basename(path))
+    target = os.path.join(STATIC_DIR, f"{name}.{digest}{ext}")
+    if not os.path.exists(target):
+        os.makedirs(STATIC_DIR, exist_ok=True)
+        tmp = f"{target}.{os.getpid()}.tmp"
+        shutil.copyfile(path, tmp)
+        os.replace(tmp, target)
+    return f"app/static/{os.path.basename(target)}"
+
+
+def image_src(path=LOGO_FILE):
+    # An <img src> for the file: a content-hashed static URL or a data URI;
+    # "" when the file is missing
+    def build():
+        data, digest = _read(path)
+        if data is None:
+            return ""
+        if STATIC_SERVING:
+            return _publish(path, data, digest)
+        mime = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        return f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}"
+    return _once(("image", path, STATIC_SERVING), build)
+
+
+def logo_html(path=LOGO_FILE):
+    src = image_src(path)
+    return f"<div style='text-align:center;'><img src='{src}'></div>" if src else ""
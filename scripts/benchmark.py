@@ -0,0 +1,313 @@
+# --- Imports ---
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+import catalog
+import llm_guard
+import llm_providers
+import recipe_cost
+import recipe_memory
+import recipe_parser
+import recipe_store
+from recipe_store import RECIPE_COLUMNS
+
+# --- Global Paths ---
+SCRIPT_DIR = os.path.dirname(__file__)
+DATA_DIR = os.path.join(SCRIPT_DIR, "data")
+RESULTS_DIR = os.path.join(DATA_DIR, "benchmarks")
+
+# --- Benchmark Suite ---
+# Times the recipe pipeline's hot paths against synthetic Recipebases of
+# increasing size, with the offline stub standing in for the LLM. Results
+# are written as JSON (one record per size and case, in ms per operation)
+# so runs before and after a change can be compared with --compare.
+DEFAULT_SIZES = [1000, 10000, 100000]
+SYLLABLES = ["ka", "ra", "pa", "ma", "ku", "zhi", "ttu", "van", "nai", "pu", "li", "sa",
+             "thu", "va", "di", "lu", "mo", "ru", "ko", "ppam", "dai", "yam", "chi", "kal"]
+DISHES = ["sambar", "rasam", "kootu", "poriyal", "kuzhambu", "adai", "dosai", "idli", "pongal",
+          "payasam", "kozhukattai", "paniyaram", "thogayal", "aviyal", "vadai", "kali", "kanji"]
+
+
+def synthetic_names(count, seed):
+    rng = random.Random(seed)
+    names, seen = [], set()
+    while len(names) < count:
+        word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        name = f"{word} {rng.choice(DISHES)}"
+        if rng.random() < 0.3:
+            name = f"{''.join(rng.choice(SYLLABLES) for _ in range(2))} {name}"
+        if name not in seen:
+            seen.add(name)
+            names.append(name)
+    return names
+
+
+def synthetic_rows(names, price=None):
+    # Field values come from parsed stub answers, cycled over the names;
+    # price(ingredients_json) -> (cost, unmatched, rows) adds ingredient rows
+    templates = []
+    for name in names[:64]:
+        parsed = recipe_parser.parse_chef_response(llm_providers.render_stub(name, "chef-json"), name)
+        template = {col: parsed.get(col, "") for col in RECIPE_COLUMNS}
+        if price:
+            cost, _, ingredient_rows = price(parsed["__parsed_json_ingredients"])
+            template.update(recipe_cost.cost_fields("flat", cost, ingredient_rows))
+        templates.append(template)
+    rows = []
+    for i, name in enumerate(names):
+        row = dict(templates[i % len(templates)])
+        row["Recipe_Name"] = name.title()
+        row["Total_Cost_(₹_Per_Person)"] = f"₹ {50 + i % 200}.0"
+        rows.append(row)
+    return rows
+
+
+def typo(name, rng):
+    chars = list(name)
+    pos = rng.randrange(len(chars) - 1)
+    chars[pos], chars[pos + 1] = chars[pos + 1], chars[pos]
+    return "".join(chars)
+
+
+def stats(samples):
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "mean": round(statistics.fmean(ordered), 4),
+        "p50": round(ordered[len(ordered) // 2], 4),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4),
+        "min": round(ordered[0], 4),
+        "max": round(ordered[-1], 4),
+    }
+
+
+def timed(fn, repeat=1, setup=None):
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def each(fn, items):
+    samples = []
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+# --- Import-time Profile ---
+# Cold start is mostly imports: each module is imported in a fresh
+# interpreter under -X importtime and reported as size 0, with the
+# packages that cost it the most.
+IMPORT_MODULES = ["recipe_store", "recipe_memory", "recipe_cost", "catalog", "llm_providers", "recipe_engine"]
+
+
+def import_profile(module):
+    # (total ms, {top-level package: cumulative ms}) for one fresh import
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=SCRIPT_DIR, capture_output=True, text=True)
+    if proc.returncode:
+        raise RuntimeError(f"import {module} failed: {proc.stderr.strip().splitlines()[-1]}")
+    total, packages = 0.0, {}
+    for line in proc.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name, ms = parts[2].strip(), int(parts[1]) / 1000
+        if name == module:
+            total = ms
+        else:
+            top = name.split(".")[0]
+            packages[top] = max(packages.get(top, 0.0), ms)
+    return total, packages
+
+
+def run_imports(args, record):
+    for module in IMPORT_MODULES:
+        samples, heaviest = [], {}
+        for _ in range(args.repeat):
+            total, heaviest = import_profile(module)
+            samples.append(total)
+        record(0, f"import_{module}", samples)
+        top = sorted(heaviest.items(), key=lambda item: -item[1])[:4]
+        print(f"{'':>9}{'':<26} heaviest: " + ", ".join(f"{name} {ms:.0f} ms" for name, ms in top))
+
+
+def run_size(size, args, catalogs, record):
+    rng = random.Random(size)
+    names = synthetic_names(size, seed=size)
+    keys = [recipe_store.lookup_key(name) for name in names]
+    full, core = catalogs
+    app2_skus, app2_prices = full.normalized, full.normalized_prices
+    app_skus, app_prices = core.skus, core.prices
+
+    with tempfile.TemporaryDirectory() as tmp:
+        excel_path = os.path.join(tmp, "Recipebase.xlsx")
+        db_path = os.path.join(tmp, "Recipebase.db")
+        sku_db = os.path.join(tmp, "sku_resolutions.db")
+        with contextlib.redirect_stdout(io.StringIO()):
+            rows = synthetic_rows(names, lambda ing: recipe_cost.price_json(ing, app2_skus, app2_prices, sku_db, full.fingerprint))
+        df = pd.DataFrame(rows, columns=RECIPE_COLUMNS)
+
+        # Persistence as the apps originally did it: rewrite the whole workbook
+        if not args.no_excel:
+            record(size, "excel_write_full", timed(lambda: df.to_excel(excel_path, index=False), args.excel_repeat))
+            record(size, "excel_read_full", timed(lambda: pd.read_excel(excel_path), args.excel_repeat))
+
+        # The SQLite store (built without the workbook, so it starts empty)
+        store = recipe_store.RecipeStore(db_path, os.path.join(tmp, "missing.xlsx"))
+        record(size, "store_bulk_load", timed(lambda: store.append_many(rows, keys)))
+        extra = iter(synthetic_names(size + args.repeat * 4, seed=size)[size:])
+        record(size, "store_append", timed(lambda: store.append({"Recipe_Name": next(extra)}), args.repeat))
+
+        record(size, "load_memory_cold", timed(lambda: recipe_memory.load_memory(store), args.repeat,
+                                               setup=lambda: recipe_memory.invalidate(store)))
+        record(size, "load_memory_warm", timed(lambda: recipe_memory.load_memory(store), args.repeat))
+        record(size, "load_memory_incremental", timed(lambda: recipe_memory.load_memory(store), args.repeat,
+                                                      setup=lambda: store.append({"Recipe_Name": next(extra)})))
+
+        memory = recipe_memory.load_memory(store)
+        hits = rng.sample(keys, min(args.queries, len(keys)))
+        record(size, "lookup_exact", each(lambda key: memory.find("__Recipe_Lookup_Key", key), hits))
+        spellings = [f"{key.upper()}!" for key in hits]
+        record(size, "lookup_alias", each(memory.find_alias, spellings))
+        record(size, "fuzzy_index_build", timed(lambda: memory.fuzzy_index("__Recipe_Lookup_Key")))
+        typos = [typo(key, rng) for key in hits[:args.queries // 4 or 1]]
+        record(size, "lookup_fuzzy", each(lambda key: memory.find_similar("__Recipe_Lookup_Key", key), typos))
+
+        # Chat cards of memory hits: rendered once, then served from the card cache
+        def card_md(row):
+            return "".join(f"### {col}\n{row[col]}\n\n" for col in RECIPE_COLUMNS)
+
+        def cached_card(row):
+            return memory.card(row, "bench", lambda: card_md(row), RECIPE_COLUMNS)
+
+        hit_rows = [memory.find("__Recipe_Lookup_Key", key) for key in hits]
+        record(size, "card_render", each(card_md, hit_rows))
+        each(cached_card, hit_rows)
+        record(size, "card_cached", each(cached_card, hit_rows))
+
+        # Parsing and costing of stub answers for dishes not in the store
+        miss_names = synthetic_names(args.queries, seed=size + 1)
+        chef = [llm_providers.render_stub(name, "chef-json") for name in miss_names]
+        numbered = [llm_providers.render_stub(name, "numbered") for name in miss_names]
+        record(size, "parse_chef_json", each(lambda text: recipe_parser.parse_chef_response(text, "dish"), chef))
+        record(size, "parse_numbered", each(recipe_parser.parse_numbered_response, numbered))
+        json_mode = [llm_providers.render_stub(name, "json") for name in miss_names]
+        record(size, "parse_json_mode", each(recipe_parser.parse_response, json_mode))
+
+        parsed = [recipe_parser.parse_chef_response(text, "dish")["__parsed_json_ingredients"] for text in chef]
+        lines = [recipe_parser.parse_numbered_response(text)["Ingredients_(with_unit_quantity)"].split("\n")
+                 for text in numbered]
+        # compute_cost logs every ingredient; keep that out of the report
+        with contextlib.redirect_stdout(io.StringIO()):
+            cost_cold = each(lambda ing: recipe_cost.compute_cost(ing, app2_skus, app2_prices, sku_db, full.fingerprint), parsed[:1])
+            cost_warm = each(lambda ing: recipe_cost.compute_cost(ing, app2_skus, app2_prices, sku_db, full.fingerprint), parsed)
+            match_cost = each(
+                lambda ing: recipe_cost.calculate_cost(recipe_cost.match_skus(ing, app_skus, sku_db, core.fingerprint)[0], app_prices),
+                lines)
+
+            # A full miss: stub generation, parse, cost, save, reload memory
+            provider = llm_providers.StubProvider("chef-json", latency=0, chunk_delay=0)
+
+            def miss(name):
+                text = llm_providers.generate(provider, "prompt", name)
+                row = recipe_parser.parse_chef_response(text, name)
+                recipe_cost.compute_cost(row["__parsed_json_ingredients"], app2_skus, app2_prices, sku_db, full.fingerprint)
+                store.append(row, key=recipe_store.lookup_key(name))
+                recipe_memory.load_memory(store)
+
+            misses = each(miss, synthetic_names(args.repeat * 4, seed=size + 2))
+        record(size, "compute_cost_cold", cost_cold)
+        record(size, "compute_cost", cost_warm)
+        record(size, "match_and_calculate_cost", match_cost)
+        record(size, "generate_miss_stub", misses)
+
+        # Weekly price update: every flat-costed recipe re-priced in one join
+        raised = {sku: price * 1.1 for sku, price in app2_prices.items()}
+        price_lists = iter([raised, app2_prices] * args.repeat)
+        record(size, "ingredient_frame_read", timed(lambda: store.ingredient_frame("flat"), args.repeat))
+        record(size, "reprice_unchanged", timed(lambda: recipe_cost.reprice(store, full, "flat"), args.repeat))
+        record(size, "reprice_all", timed(lambda: recipe_cost.reprice(store, next(price_lists), "flat"), args.repeat))
+        recipe_memory.invalidate(store)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, base_path):
+    with open(base_path, encoding="utf-8") as f:
+        base = {(r["size"], r["case"]): r for r in json.load(f)["results"]}
+    print(f"\n{'size':>7}  {'case':<26}{'base p50':>11}{'now p50':>11}{'ratio':>8}")
+    for r in results:
+        old = base.get((r["size"], r["case"]))
+        if old and old["p50"]:
+            print(f"{r['size']:>7}  {r['case']:<26}{old['p50']:>11.3f}{r['p50']:>11.3f}{r['p50'] / old['p50']:>7.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the recipe pipeline on synthetic Recipebases")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=5, help="runs per whole-operation case")
+    parser.add_argument("--queries", type=int, default=400, help="lookups / parses per size")
+    parser.add_argument("--excel-repeat", type=int, default=1)
+    parser.add_argument("--no-excel", action="store_true", help="skip the (slow) workbook cases")
+    parser.add_argument("--no-imports", action="store_true", help="skip the -X importtime profile")
+    parser.add_argument("--out", help="results file (default: data/benchmarks/bench-<time>.json)")
+    parser.add_argument("--compare", metavar="BASE_JSON", help="print p50 ratios against an earlier run")
+    args = parser.parse_args()
+
+    catalogs = (catalog.get("full"), catalog.get("core"))
+    results = []
+
+    def record(size, case, samples):
+        results.append({"size": size, "case": case, "unit": "ms", **stats(samples)})
+        r = results[-1]
+        print(f"{size:>7}  {case:<26} p50 {r['p50']:>10.3f} ms   p95 {r['p95']:>10.3f} ms   (n={r['n']})")
+
+    if not args.no_imports:
+        run_imports(args, record)
+    for size in args.sizes:
+        run_size(size, args, catalogs, record)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({
+            "meta": {
+                "commit": git_commit(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "provider": "stub",
+                "args": vars(args),
+                "llm": llm_guard.status("stub"),
+            },
+            "results": results,
+        }, f, indent=2)
+    print(f"\nResults written to {out}")
+    if args.compare:
+        compare(results, args.compare)
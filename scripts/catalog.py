@@ -0,0 +1,176 @@
+# --- Imports ---
+import argparse
+import json
+import os
+import threading
+import time
+from functools import cached_property
+
+import sku_matcher
+
+# --- Global Paths ---
+SCRIPT_DIR = os.path.dirname(__file__)
+DATA_DIR = os.path.join(SCRIPT_DIR, "data")
+CATALOG_FILE = os.environ.get("CHEFBOT_CATALOG_FILE", os.path.join(DATA_DIR, "catalog.json"))
+CATALOG_CHECK_SECONDS = float(os.environ.get("CHEFBOT_CATALOG_CHECK_SECONDS", "5"))
+
+# --- SKU / Price Catalog ---
+# One versioned file replaces the lists every script used to hard-code:
+#   {"version": "...", "skus": [{"name", "price"}, ...],
+#    "lists": {"full": [names...], "core": [names...]}}
+# Prices are ₹ per kg or L (0 = free). "full" is the whole approved range
+# (app2.py, working gemini); "core" the short list the numbered-format
+# prompts use (app.py, debugapp.py). The file is read and validated once
+# per process; every derived form below is built then, not per import or
+# per rerun. A changed file with a new version is picked up on the next
+# get() after CATALOG_CHECK_SECONDS, without a restart.
+
+
+class CatalogError(ValueError):
+    pass
+
+
+class Catalog:
+    def __init__(self, version, name, skus, prices):
+        self.version = str(version)
+        self.name = name
+        self.tag = f"{self.version}/{name}"
+        self.skus = tuple(skus)
+        self.prices = {sku: prices[sku] for sku in self.skus}
+        self.normalized = tuple(sku.strip().lower() for sku in self.skus)
+        self.normalized_prices = dict(zip(self.normalized, self.prices.values()))
+        self.positions = {sku: slot for slot, sku in enumerate(self.normalized)}
+        self.fingerprint = sku_matcher.catalog_fingerprint(self.normalized)
+
+    @classmethod
+    def from_prices(cls, prices, version="adhoc"):
+        # A plain {sku: price} mapping, e.g. a proposed price list
+        return cls(version, "adhoc", list(prices), prices)
+
+    def __len__(self):
+        return len(self.skus)
+
+    @cached_property
+    def price_array(self):
+        # Only re-pricing needs numpy, so it is imported on first use
+        import numpy as np
+
+        return np.ascontiguousarray([float(p) for p in self.prices.values()], dtype=float)
+
+    def price_vector(self, names):
+        # Prices for lowercased SKU names (0 for unknown), as one array
+        import numpy as np
+
+        slots = np.fromiter((self.positions.get(name, -1) for name in names), dtype=np.int64)
+        return np.where(slots >= 0, self.price_array[slots], 0.0)
+
+    def resolver(self, db_path=sku_matcher.SKU_CACHE_FILE):
+        return sku_matcher.get_resolver(self.normalized, db_path, fingerprint=self.fingerprint)
+
+
+def _validate(doc, path):
+    if not isinstance(doc, dict) or not str(doc.get("version", "")).strip():
+        raise CatalogError(f"{path}: missing catalog version")
+    prices, seen = {}, set()
+    for entry in doc.get("skus") or []:
+        name, price = entry.get("name"), entry.get("price")
+        if not isinstance(name, str) or not name.strip():
+            raise CatalogError(f"{path}: SKU without a name: {entry}")
+        if isinstance(price, bool) or not isinstance(price, (int, float)) or price < 0:
+            raise CatalogError(f"{path}: bad price for '{name}': {price!r}")
+        key = name.strip().lower()
+        if key in seen:
+            raise CatalogError(f"{path}: duplicate SKU '{name}'")
+        seen.add(key)
+        prices[name] = price
+    lists = doc.get("lists") or {}
+    if not prices or not lists:
+        raise CatalogError(f"{path}: no SKUs or no lists")
+    for list_name, names in lists.items():
+        unknown = [name for name in names if name not in prices]
+        if unknown:
+            raise CatalogError(f"{path}: list '{list_name}' names unknown SKUs: {', '.join(unknown)}")
+    return prices, lists
+
+
+def load(path=None):
+    # {list name: Catalog} for every list in the file
+    path = path or CATALOG_FILE
+    try:
+        with open(path, encoding="utf-8") as f:
+            doc = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        raise CatalogError(f"{path}: {e}") from e
+    prices, lists = _validate(doc, path)
+    return {name: Catalog(doc["version"], name, names, prices) for name, names in lists.items()}
+
+
+class _Loaded:
+    def __init__(self, path, mtime, catalogs):
+        self.path = path
+        self.mtime = mtime
+        self.catalogs = catalogs
+        self.checked = time.monotonic()
+
+
+_loaded = {}
+_lock = threading.Lock()
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _version(loaded):
+    return next(iter(loaded.catalogs.values())).version
+
+
+def _reload(current):
+    # Called under _lock once the check interval has passed
+    current.checked = time.monotonic()
+    mtime = _mtime(current.path)
+    if mtime == current.mtime:
+        return
+    try:
+        catalogs = load(current.path)
+    except CatalogError as e:
+        print(f"[CATALOG] Keeping version {_version(current)}: {e}")
+        return
+    current.mtime = mtime
+    old, new = _version(current), next(iter(catalogs.values())).version
+    if new == old:
+        print(f"[CATALOG] {current.path} changed without a version bump; ignored")
+        return
+    print(f"[CATALOG] Reloaded {current.path}: version {old} → {new}")
+    current.catalogs = catalogs
+
+
+def get(name="full", path=None):
+    path = path or CATALOG_FILE
+    current = _loaded.get(path)
+    if current is None or time.monotonic() - current.checked >= CATALOG_CHECK_SECONDS:
+        with _lock:
+            current = _loaded.get(path)
+            if current is None:
+                mtime = _mtime(path)
+                current = _Loaded(path, mtime, load(path))
+                _loaded[path] = current
+            elif time.monotonic() - current.checked >= CATALOG_CHECK_SECONDS:
+                _reload(current)
+    if name not in current.catalogs:
+        raise CatalogError(f"{path}: no list named '{name}'")
+    return current.catalogs[name]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate the SKU/price catalog before publishing it")
+    parser.add_argument("path", nargs="?", default=CATALOG_FILE)
+    args = parser.parse_args()
+
+    catalogs = load(args.path)
+    print(f"{args.path}: version {next(iter(catalogs.values())).version}")
+    for name, found in catalogs.items():
+        print(f"  {name:<8}{len(found):>5} SKUs, {int((found.price_array > 0).sum()):>5} priced")
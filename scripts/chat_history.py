@@ -0,0 +1,52 @@
+# --- Imports ---
+import os
+
+# --- Settings ---
+# Messages kept per session, and the recent turns (user + reply) drawn on
+# every rerun; older ones are only rendered when the user asks for them.
+HISTORY_LIMIT = int(os.environ.get("CHEFBOT_CHAT_HISTORY_LIMIT", "100"))
+RENDER_TURNS = int(os.environ.get("CHEFBOT_CHAT_RENDER_TURNS", "10"))
+
+# --- Compact Chat History ---
+# st.session_state.messages used to hold the full markdown of every reply.
+# A recipe reply is now stored as a reference (recipe id + card style) and
+# turned back into markdown through the shared card cache when drawn, so a
+# session costs a few bytes per recipe. Anything else (the user's text,
+# suggestions, notices) stays as plain content.
+
+
+def text(role, content):
+    return {"role": role, "content": content}
+
+
+def recipe(recipe_id, style):
+    return {"role": "assistant", "recipe_id": int(recipe_id), "style": style}
+
+
+def append(messages, entry, limit=None):
+    # Oldest messages are dropped past the cap
+    messages.append(entry)
+    limit = HISTORY_LIMIT if limit is None else limit
+    if len(messages) > limit:
+        del messages[:len(messages) - limit]
+
+
+def window(messages, turns=None):
+    # (older, recent): recent is what gets drawn on every rerun
+    turns = RENDER_TURNS if turns is None else turns
+    split = max(len(messages) - 2 * turns, 0)
+    return messages[:split], messages[split:]
+
+
+def needs_memory(messages):
+    return any("recipe_id" in msg for msg in messages)
+
+
+def resolve(entry, memory, card):
+    # Markdown for one entry; card(row, style) builds a recipe card
+    if "recipe_id" not in entry:
+        return entry["content"]
+    row = memory.find("__Recipe_Id", entry["recipe_id"]) if memory is not None else None
+    if row is None:
+        return "_This recipe is no longer in Lifecode Chef's memory._"
+    return card(row, entry["style"])
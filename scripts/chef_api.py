@@ -0,0 +1,245 @@
+# --- Imports ---
+import argparse
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import catalog
+import llm_guard
+import recipe_parser
+import recipe_service
+import turn_metrics
+
+# --- Settings ---
+GEMINI_API_KEY = os.environ.get("CHEFBOT_GEMINI_API_KEY", "")
+MAX_BODY_BYTES = int(os.environ.get("CHEFBOT_API_MAX_BODY_BYTES", str(64 * 1024)))
+# Memory reads and LLM generations run on separate thread pools, so slow
+# generations can never hold up lookups queued behind them
+LOOKUP_WORKERS = int(os.environ.get("CHEFBOT_API_LOOKUP_WORKERS", "8"))
+GENERATE_WORKERS = int(os.environ.get("CHEFBOT_API_GENERATE_WORKERS", "16"))
+SEARCH_LIMIT = 20
+
+# --- Recipe HTTP API ---
+# A plain ASGI application over recipe_service.py (the flow behind
+# app2.py), for the mobile app and partner integrations. No framework is
+# needed; run it under any ASGI server, e.g.
+#   uvicorn chef_api:app --workers 4
+#   GET  /health
+#   GET  /recipes/lookup?name=<dish>        stored recipe, or 404 + suggestion
+#   GET  /recipes/search?q=<text>&limit=5   closest stored recipes
+#   POST /recipes/generate {"name", "api_key"?}   memory first, then Gemini
+#   POST /cost {"ingredients": [{"name", "quantity"}, ...]}
+# The Gemini key comes from the body, an X-Gemini-Api-Key header or
+# CHEFBOT_GEMINI_API_KEY. Every request is timed like a chat turn
+# (python turn_metrics.py --source api).
+_pools = {
+    "lookup": ThreadPoolExecutor(LOOKUP_WORKERS, thread_name_prefix="api-lookup"),
+    "generate": ThreadPoolExecutor(GENERATE_WORKERS, thread_name_prefix="api-generate"),
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _text(value):
+    # Empty cells come back as None/NaN from the memory frame
+    if value is None or value != value:
+        return ""
+    return str(value)
+
+
+def recipe_json(row):
+    recipe = {key: _text(row.get(column)) for key, column, _, _ in recipe_parser.JSON_FIELDS}
+    if row.get("__Recipe_Id") is not None:
+        recipe["id"] = int(row["__Recipe_Id"])
+    return recipe
+
+
+def _param(params, name, required=True):
+    value = (params.get(name) or [""])[0].strip()
+    if required and not value:
+        raise HTTPError(400, f"'{name}' is required")
+    return value
+
+
+def _name(body):
+    name = body.get("name") if isinstance(body, dict) else None
+    if not isinstance(name, str) or not name.strip():
+        raise HTTPError(400, "'name' is required")
+    return name.strip()
+
+
+def _suggestions(name, limit=3):
+    return [{"name": _text(row.get("Recipe_Name")), "key": key, "score": score}
+            for key, score, row in recipe_service.search(name, limit=limit)]
+
+
+# --- Handlers ---
+# Each runs on a worker thread and returns (status, JSON payload)
+def health(params, body, headers):
+    return 200, {"status": "ok", "llm": llm_guard.status("gemini")}
+
+
+def lookup(params, body, headers):
+    name = _param(params, "name")
+    with turn_metrics.turn("api", name) as api_turn:
+        with api_turn.span("load_memory"):
+            memory = recipe_service.load_memory()
+        row, similar = recipe_service.lookup(name, memory)
+        if row is None:
+            api_turn.outcome = "not_found"
+            suggestion = None
+            if similar is not None:
+                suggestion = {"name": _text(similar[0].get("Recipe_Name")), "score": similar[1]}
+            return 404, {"error": f"No stored recipe for '{name}'", "suggestion": suggestion}
+        api_turn.outcome = "memory"
+        return 200, {"source": "memory", "recipe": recipe_json(row)}
+
+
+def search(params, body, headers):
+    query = _param(params, "q")
+    try:
+        limit = min(max(int(_param(params, "limit", required=False) or 5), 1), SEARCH_LIMIT)
+    except ValueError:
+        raise HTTPError(400, "'limit' must be a number")
+    return 200, {"results": _suggestions(query, limit)}
+
+
+def generate(params, body, headers):
+    name = _name(body)
+    api_key = body.get("api_key") or headers.get("x-gemini-api-key") or GEMINI_API_KEY
+    with turn_metrics.turn("api", name) as api_turn:
+        with api_turn.span("load_memory"):
+            memory = recipe_service.load_memory()
+        row, _ = recipe_service.lookup(name, memory)
+        if row is not None:
+            api_turn.outcome = "memory"
+            return 200, {"source": "memory", "recipe": recipe_json(row)}
+        try:
+            recipe, shared = recipe_service.generate_shared(name, api_key)
+        except llm_guard.LLMUnavailable as e:
+            api_turn.outcome = "memory_only"
+            payload = {"error": f"Gemini Chef is unavailable right now ({e})", "suggestions": _suggestions(name)}
+            if getattr(e, "retry_in", 0):
+                # A dish that just failed is not retried before then
+                payload["retry_in"] = round(e.retry_in)
+            return 503, payload
+        api_turn.outcome = "generated"
+        return 200, {"source": "generated", "shared": shared, "recipe": recipe_json(recipe)}
+
+
+def cost(params, body, headers):
+    ingredients = body.get("ingredients") if isinstance(body, dict) else None
+    if not isinstance(ingredients, list) or not all(
+        isinstance(item, dict) and isinstance(item.get("name"), str) for item in ingredients
+    ):
+        raise HTTPError(400, "'ingredients' must be a list of {name, quantity} objects")
+    total, unmatched, rows = recipe_service.price(ingredients)
+    return 200, {
+        "total": round(total, 2),
+        "currency": "INR",
+        "cost_model": recipe_service.COST_MODEL,
+        "catalog_version": catalog.get("full").version,
+        "matched": [{"sku": sku, "quantity": quantity} for sku, quantity in rows],
+        "unmatched": unmatched,
+    }
+
+
+# path -> (method, handler, pool)
+ROUTES = {
+    "/health": ("GET", health, "lookup"),
+    "/recipes/lookup": ("GET", lookup, "lookup"),
+    "/recipes/search": ("GET", search, "lookup"),
+    "/recipes/generate": ("POST", generate, "generate"),
+    "/cost": ("POST", cost, "lookup"),
+}
+
+
+# --- ASGI Plumbing ---
+async def _read_body(receive):
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise HTTPError(413, f"Request body is over {MAX_BODY_BYTES} bytes")
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            break
+    try:
+        return json.loads(b"".join(chunks) or b"{}")
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise HTTPError(400, "Request body must be JSON")
+
+
+async def _send_json(send, status, payload):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json; charset=utf-8"),
+                    (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _lifespan(receive, send):
+    loop = asyncio.get_running_loop()
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            # Load the recipe memory (and re-price it if needed) before serving
+            await loop.run_in_executor(_pools["lookup"], recipe_service.load_memory)
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            for pool in _pools.values():
+                pool.shutdown(wait=False, cancel_futures=True)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+    try:
+        route = ROUTES.get(scope["path"].rstrip("/") or "/")
+        if route is None:
+            raise HTTPError(404, f"No such endpoint: {scope['path']}")
+        method, handler, pool = route
+        if scope["method"] != method:
+            raise HTTPError(405, f"{scope['path']} only accepts {method}")
+        params = parse_qs(scope.get("query_string", b"").decode("utf-8", "replace"))
+        headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope.get("headers", [])}
+        body = await _read_body(receive) if method == "POST" else {}
+        loop = asyncio.get_running_loop()
+        status, payload = await loop.run_in_executor(_pools[pool], handler, params, body, headers)
+    except HTTPError as e:
+        status, payload = e.status, {"error": e.message}
+    except Exception as e:
+        print(f"[API] {scope.get('method')} {scope.get('path')} failed: {e!r}")
+        status, payload = 500, {"error": "Internal error"}
+    await _send_json(send, status, payload)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the Lifecode recipe API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1, help="server processes")
+    args = parser.parse_args()
+    try:
+        import uvicorn
+    except ImportError:
+        sys.exit("chef_api.py needs an ASGI server: pip install uvicorn (or run chef_api:app under another one)")
+    uvicorn.run("chef_api:app", host=args.host, port=args.port, workers=args.workers)
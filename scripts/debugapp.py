@@ -1,49 +1,25 @@
 import streamlit as st
-import google.generativeai as genai
-import pandas as pd
-import os
-import re
+
+import catalog
+import llm_guard
+import llm_providers
+import prompt_builder
 
 # Setup
 st.set_page_config(page_title="🔍 Gemini Recipe Debugger")
 st.title("👨‍🍳 Lifecode Gemini Recipe Tester")
 
 # File setup
-EXCEL_FILE = "Recipebase_Debug.xlsx"
-APPROVED_SKU_LIST = [
-    "Almonds (Whole)", "Sunflower Seed (Whole)", "Pumpkin Seed (Whole)",
-    "Black Raisins (Whole)", "Cashew (Whole)", "Dates (Whole)", "Raisins (Whole)",
-    "Walnut (Whole)", "Toor Dal Arhar Split", "Black Pepper (Whole)", "Turmeric",
-    "Cold Pressed Sesame Oil White", "Mustard (Whole)", "Cumin (Whole)", "Dry Red Chilli",
-    "Garlic", "Curry Leaves", "Coriander Leaves", "Salt", "Water"
-]
-
-PRICE_DICT = {
-    "Almonds (Whole)": 940, "Sunflower Seed (Whole)": 130, "Pumpkin Seed (Whole)": 530,
-    "Black Raisins (Whole)": 195, "Cashew (Whole)": 1000, "Dates (Whole)": 250,
-    "Raisins (Whole)": 195, "Walnut (Whole)": 1370, "Toor Dal Arhar Split": 155,
-    "Black Pepper (Whole)": 950, "Turmeric": 210, "Cold Pressed Sesame Oil White": 310,
-    "Mustard (Whole)": 120, "Cumin (Whole)": 365, "Dry Red Chilli": 320,
-    "Garlic": 0, "Curry Leaves": 0, "Coriander Leaves": 0, "Salt": 0, "Water": 0
-}
+CATALOG = catalog.get("core")
+APPROVED_SKU_LIST = CATALOG.skus
+PRICE_DICT = CATALOG.prices
 
 # Prompt Generator
-def build_prompt(dish_name):
-    approved_list = "\n".join([f"• {item}" for item in APPROVED_SKU_LIST])
-    prices = "\n".join([f"• {k} – ₹{v}/kg or /L" for k, v in PRICE_DICT.items()])
-    return f"""
+PROMPT_TEMPLATE = """
 You are a wise and experienced 60+ year old Chettinad chef working for a modern nutrition brand called Lifecode.
 Use ONLY the approved ingredients and format shown.
 
-====================
-📦 APPROVED INGREDIENTS
-====================
-{approved_list}
-
-====================
-💰 INGREDIENT PRICES
-====================
-{prices}
+{catalog}
 
 ====================
 🎯 OUTPUT FORMAT
@@ -68,21 +44,28 @@ Dish Name: {dish_name}
 Only use g/ml. Never use cups, spoons, or other units.
 """
 
+def build_prompt(dish_name, encoding=None):
+    # Catalog section is compiled once per catalog version and encoding
+    return prompt_builder.compile_prompt(PROMPT_TEMPLATE, APPROVED_SKU_LIST, PRICE_DICT, encoding, version=CATALOG.tag).render_with_stats(dish_name)
+
 # Get user input
 api_key = st.text_input("🔑 Gemini API Key", type="password")
 dish_name = st.text_input("🍛 Enter Dish Name")
+catalog_encoding = st.radio("📦 Catalog encoding", ["full", "compact"], horizontal=True)
 
-if api_key and dish_name:
+provider_kind = llm_providers.provider_kind("gemini")
+if (api_key or provider_kind == "stub") and dish_name:
     try:
-        st.info("🔄 Initializing Gemini model...")
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel("gemini-1.5-flash")
+        st.info(f"🔄 Initializing {provider_kind} provider...")
+        provider = llm_providers.get_provider(
+            "gemini", stub_format="numbered", api_key=api_key, model_name="gemini-1.5-flash", transport="grpc"
+        )
         
-        prompt = build_prompt(dish_name)
+        prompt, stats = build_prompt(dish_name, catalog_encoding)
+        st.caption(f"Prompt size: {stats['chars']} chars, ~{stats['est_tokens']} tokens ({catalog_encoding} catalog)")
         st.success("✅ Gemini initialized. Sending prompt...")
 
-        response = model.generate_content(prompt)
-        output = response.text
+        output = llm_providers.generate(provider, prompt, dish_name)
         st.success("✅ Response received!")
         
         # Show raw output
@@ -91,5 +74,6 @@ if api_key and dish_name:
 
     except Exception as e:
         st.error(f"❌ Error: {e}")
+    st.caption(f"{provider_kind} call health: {llm_guard.status(provider_kind)}")
 else:
     st.warning("Please enter both your Gemini API key and a dish name to begin.")
@@ -0,0 +1,83 @@
+# --- Imports ---
+import os
+import re
+import unicodedata
+from collections import Counter
+
+# --- Thresholds ---
+# Scores are trigram Dice coefficients in [0, 1]. At or above ACCEPT the
+# stored recipe is served straight away; between SUGGEST and ACCEPT the
+# chat asks "did you mean ...?" before calling the LLM.
+FUZZY_SUGGEST_THRESHOLD = float(os.environ.get("CHEFBOT_FUZZY_SUGGEST", "0.6"))
+FUZZY_ACCEPT_THRESHOLD = float(os.environ.get("CHEFBOT_FUZZY_ACCEPT", "0.9"))
+
+# Tamil vowel signs and the virama are combining marks, not \w; keeping the
+# whole Tamil block stops "வாழைப்பூ வடை" collapsing to "வ ழ ப ப வட" (and
+# distinct dishes sharing single-flight and negative-cache keys)
+_NON_WORD = re.compile(r"[^\w\u0B80-\u0BFF]+", re.UNICODE)
+
+
+def normalize_name(name):
+    text = unicodedata.normalize("NFC", str(name or "")).lower()
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# --- Trigram Index ---
+class FuzzyIndex:
+    def __init__(self, entries=()):
+        self._keys = []
+        self._values = []
+        self._grams = []
+        self._postings = {}
+        self._exact = {}
+        for key, value in entries:
+            self.add(key, value)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, key, value):
+        key = normalize_name(key)
+        if not key or key in self._exact:
+            return
+        slot = len(self._keys)
+        grams = trigrams(key)
+        self._keys.append(key)
+        self._values.append(value)
+        self._grams.append(len(grams))
+        self._exact[key] = slot
+        for gram in grams:
+            self._postings.setdefault(gram, []).append(slot)
+
+    def search(self, query, limit=3, threshold=FUZZY_SUGGEST_THRESHOLD, upto=None):
+        # upto: only the first `upto` slots count (an index shared by
+        # snapshots that each see a prefix of it)
+        upto = len(self._keys) if upto is None else upto
+        query = normalize_name(query)
+        if not query:
+            return []
+        slot = self._exact.get(query)
+        if slot is not None and slot < upto:
+            return [(self._keys[slot], self._values[slot], 1.0)]
+
+        grams = trigrams(query)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+
+        results = []
+        for slot, count in shared.items():
+            score = 2.0 * count / (len(grams) + self._grams[slot])
+            if score >= threshold and slot < upto:
+                results.append((score, slot))
+        results.sort(reverse=True)
+        return [(self._keys[slot], self._values[slot], round(score, 3)) for score, slot in results[:limit]]
+
+    def best(self, query, threshold=FUZZY_SUGGEST_THRESHOLD, upto=None):
+        hits = self.search(query, limit=1, threshold=threshold, upto=upto)
+        return hits[0] if hits else None
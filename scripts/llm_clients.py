@@ -0,0 +1,129 @@
+# --- Imports ---
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+# --- Reusable LLM Clients ---
+# genai.configure() + GenerativeModel() on every miss rebuilt the SDK client
+# and paid a fresh TLS handshake each time. Clients here are created once per
+# API key (and model) for the whole process, so their HTTP sessions keep
+# connections alive between calls. Every user brings their own key, so the
+# caches are bounded LRUs keyed by a hash of the key; the least recently
+# used client is dropped past CLIENT_CACHE_SIZE.
+CLIENT_CACHE_SIZE = int(os.environ.get("CHEFBOT_LLM_CLIENT_CACHE_SIZE", "32"))
+
+_lock = threading.Lock()
+_gemini_clients = OrderedDict()
+_openai_clients = OrderedDict()
+_openai_session = None
+
+
+def _key_id(api_key):
+    return hashlib.sha256(str(api_key).encode("utf-8")).hexdigest()
+
+
+def _cached(cache, cache_key, build):
+    with _lock:
+        client = cache.get(cache_key)
+        if client is None:
+            client = cache[cache_key] = build()
+        cache.move_to_end(cache_key)
+        while len(cache) > CLIENT_CACHE_SIZE:
+            cache.popitem(last=False)
+    return client
+
+
+def _gemini_schema(schema):
+    # recipe_parser's JSON schema as a generativelanguage Schema message
+    from google.ai import generativelanguage as glm
+
+    return glm.Schema(
+        type_=schema["type"].upper(),
+        properties={name: _gemini_schema(value) for name, value in schema.get("properties", {}).items()},
+        items=_gemini_schema(schema["items"]) if "items" in schema else None,
+        required=schema.get("required", []),
+    )
+
+
+def _gemini_text(response):
+    if not response.candidates:
+        return ""
+    return "".join(part.text for part in response.candidates[0].content.parts)
+
+
+class GeminiModel:
+    # One model on a per-key GenerativeServiceClient (instead of the SDK's
+    # global genai.configure()), so sessions with different keys never
+    # clobber each other
+    def __init__(self, client, model_name):
+        self.client = client
+        self.model_name = model_name if model_name.startswith("models/") else f"models/{model_name}"
+
+    def _request(self, prompt, json_schema):
+        from google.ai import generativelanguage as glm
+
+        config = None
+        if json_schema is not None:
+            config = glm.GenerationConfig(response_mime_type="application/json",
+                                          response_schema=_gemini_schema(json_schema))
+        return glm.GenerateContentRequest(
+            model=self.model_name,
+            contents=[glm.Content(role="user", parts=[glm.Part(text=prompt)])],
+            generation_config=config,
+        )
+
+    def generate(self, prompt, timeout=None, json_schema=None):
+        return _gemini_text(self.client.generate_content(request=self._request(prompt, json_schema), timeout=timeout))
+
+    def stream(self, prompt, timeout=None, json_schema=None):
+        for chunk in self.client.stream_generate_content(request=self._request(prompt, json_schema), timeout=timeout):
+            yield _gemini_text(chunk)
+
+
+def gemini_model(api_key, model_name, transport="rest"):
+    from google.ai import generativelanguage as glm
+
+    client = _cached(_gemini_clients, (_key_id(api_key), transport), lambda: glm.GenerativeServiceClient(
+        transport=transport, client_options={"api_key": api_key}
+    ))
+    return GeminiModel(client, model_name)
+
+
+def openai_chat(messages, model="gpt-4", temperature=0.2, api_key=None, timeout=None, **kwargs):
+    global _openai_session
+    import openai
+
+    if hasattr(openai, "OpenAI"):
+        # openai>=1.0: one client (and httpx connection pool) per key
+        client = _cached(_openai_clients, _key_id(api_key),
+                         lambda: openai.OpenAI(api_key=api_key) if api_key else openai.OpenAI())
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        response = client.chat.completions.create(
+            model=model, messages=messages, temperature=temperature, **kwargs
+        )
+        return response.choices[0].message.content
+
+    # openai<1.0: share one keep-alive requests session across calls
+    if _openai_session is None:
+        with _lock:
+            if _openai_session is None:
+                import requests
+                _openai_session = requests.Session()
+                openai.requestssession = _openai_session
+    if api_key:
+        kwargs["api_key"] = api_key
+    if timeout is not None:
+        kwargs["request_timeout"] = timeout
+    return openai.ChatCompletion.create(
+        model=model, messages=messages, temperature=temperature, **kwargs
+    )["choices"][0]["message"]["content"]
+
+
+def reset():
+    global _openai_session
+    with _lock:
+        _gemini_clients.clear()
+        _openai_clients.clear()
+        _openai_session = None
@@ -0,0 +1,212 @@
+# --- Imports ---
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+
+# --- Guarded LLM Calls ---
+# Every Gemini/OpenAI request goes through call(). It gets a deadline, and
+# the remaining budget is passed to the SDK as its request timeout, so a
+# hung request releases its thread. Transient failures (timeouts, 429, 5xx,
+# dropped connections) are retried with jittered exponential backoff inside
+# that same budget. A per-provider circuit breaker stops sending requests
+# after repeated transient failures, which lets the apps answer from memory
+# until one probe request succeeds again.
+LLM_DEADLINE = float(os.environ.get("CHEFBOT_LLM_DEADLINE", "45"))
+LLM_MAX_ATTEMPTS = int(os.environ.get("CHEFBOT_LLM_ATTEMPTS", "3"))
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+BREAKER_FAILURES = int(os.environ.get("CHEFBOT_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.environ.get("CHEFBOT_BREAKER_COOLDOWN", "30"))
+LATENCY_WINDOW = 500
+
+# Matched by class name so neither SDK has to be importable here
+TRANSIENT_ERRORS = {
+    "TimeoutError", "ConnectionError", "DeadlineExceeded", "ServiceUnavailable", "ResourceExhausted",
+    "InternalServerError", "TooManyRequests", "BadGateway", "GatewayTimeout", "Aborted",
+    "RateLimitError", "APITimeoutError", "APIConnectionError", "Timeout", "ServiceUnavailableError",
+    "ReadTimeout", "ConnectTimeout",
+}
+
+
+class LLMUnavailable(Exception):
+    pass
+
+
+class CircuitOpen(LLMUnavailable):
+    pass
+
+
+def is_transient(error):
+    if any(cls.__name__ in TRANSIENT_ERRORS for cls in type(error).__mro__):
+        return True
+    status = getattr(error, "status_code", None) or getattr(error, "http_status", None) or getattr(error, "code", None)
+    return isinstance(status, int) and (status == 429 or status >= 500)
+
+
+class LatencyTracker:
+    # Durations of the last LATENCY_WINDOW calls, failures included, since
+    # the hung ones are what drive the tail
+    def __init__(self, window=LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentiles(self, points=(50, 95, 99)):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return {}
+        # Nearest-rank percentiles
+        return {f"p{p}": round(samples[max(0, math.ceil(p / 100 * len(samples)) - 1)], 3) for p in points}
+
+
+class CircuitBreaker:
+    # closed -> open after BREAKER_FAILURES transient failures in a row;
+    # open -> half-open once the cooldown passes, letting a single probe
+    # through; the probe's outcome closes or re-opens the circuit
+    def __init__(self, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._consecutive = 0
+        self._opened_at = None
+        self._probing = False
+
+    def _state(self):
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.cooldown:
+            return "open"
+        return "half-open"
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def retry_in(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+
+    def allow(self):
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._consecutive = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive += 1
+            if self._probing or self._consecutive >= self.failures:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self):
+        # The call was abandoned by the caller (e.g. a Streamlit rerun): no
+        # verdict on the provider, but the next caller may probe
+        with self._lock:
+            self._probing = False
+
+    def record(self, outcome):
+        if outcome == "success":
+            self.record_success()
+        elif outcome == "failure":
+            self.record_failure()
+        else:
+            self.release()
+
+
+class Provider:
+    def __init__(self, name):
+        self.name = name
+        self.breaker = CircuitBreaker()
+        self.latency = LatencyTracker()
+
+
+_providers = {}
+_lock = threading.Lock()
+
+
+def provider(name):
+    found = _providers.get(name)
+    if found is None:
+        with _lock:
+            found = _providers.setdefault(name, Provider(name))
+    return found
+
+
+def available(name):
+    return provider(name).breaker.state != "open"
+
+
+def status(name):
+    found = provider(name)
+    return {"state": found.breaker.state, "retry_in": round(found.breaker.retry_in(), 1),
+            **found.latency.percentiles()}
+
+
+def call(name, fn, deadline=None, attempts=None, retry_if=None):
+    # fn(timeout) performs one request with the given timeout in seconds.
+    # retry_if() can veto a retry, e.g. once a stream has shown output.
+    # Any failure surfaces as LLMUnavailable (CircuitOpen when failing fast).
+    found = provider(name)
+    if not found.breaker.allow():
+        raise CircuitOpen(f"{name} is degraded; retrying in {found.breaker.retry_in():.0f}s")
+
+    expires = time.monotonic() + (LLM_DEADLINE if deadline is None else deadline)
+    attempts = attempts or LLM_MAX_ATTEMPTS
+    # The breaker hears the outcome however the call ends; anything that is
+    # not an Exception (Streamlit's stop/rerun out of a stream callback)
+    # only releases a half-open probe
+    outcome = None
+    try:
+        for attempt in range(1, attempts + 1):
+            started = time.monotonic()
+            try:
+                result = fn(max(0.1, expires - started))
+            except Exception as e:
+                found.latency.record(time.monotonic() - started)
+                if not is_transient(e):
+                    # The provider answered; the request itself was bad
+                    outcome = "success"
+                    raise LLMUnavailable(f"{name} rejected the request: {e}") from e
+                delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (attempt - 1)))
+                if attempt == attempts or time.monotonic() + delay >= expires or (retry_if and not retry_if()):
+                    outcome = "failure"
+                    raise LLMUnavailable(f"{name} failed after {attempt} attempt(s): {e}") from e
+                print(f"[RETRY] {name} attempt {attempt} failed ({type(e).__name__}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            found.latency.record(time.monotonic() - started)
+            outcome = "success"
+            return result
+    finally:
+        found.breaker.record(outcome)
+
+
+def stream_until(chunks, timeout):
+    # Gaps between chunks are bounded by the SDK timeout; this bounds the
+    # stream as a whole
+    expires = time.monotonic() + timeout
+    for chunk in chunks:
+        yield chunk
+        if time.monotonic() > expires:
+            raise TimeoutError(f"stream exceeded its {timeout:.0f}s deadline")
@@ -0,0 +1,255 @@
+# --- Imports ---
+import hashlib
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from functools import lru_cache
+
+import llm_clients
+import llm_guard
+import recipe_parser
+
+# --- LLM Providers ---
+# Every entry point asks for a provider by the kind it was built for
+# (Gemini for the apps, OpenAI for recipe_engine). CHEFBOT_LLM_PROVIDER
+# overrides that choice everywhere. With "stub" the whole pipeline runs
+# offline, with no network and no API key, against deterministic templated
+# answers in the format each entry point parses.
+#   complete(prompt, timeout, dish_name, json_mode) -> full response text
+#   stream(prompt, timeout, dish_name, json_mode)   -> iterator of text chunks
+# json_mode asks a provider that supports it for one strict JSON object
+# (recipe_parser.RECIPE_JSON_SCHEMA); CHEFBOT_JSON_MODE=0 turns that off.
+PROVIDER_OVERRIDE = os.environ.get("CHEFBOT_LLM_PROVIDER", "")
+JSON_MODE = os.environ.get("CHEFBOT_JSON_MODE", "1") != "0"
+STUB_LATENCY = float(os.environ.get("CHEFBOT_STUB_LATENCY", "0"))
+STUB_CHUNK_DELAY = float(os.environ.get("CHEFBOT_STUB_CHUNK_DELAY", "0"))
+STUB_RESPONSES_FILE = os.environ.get("CHEFBOT_STUB_RESPONSES", "")
+STUB_CHUNK_SIZE = 48
+
+
+class LLMProvider(ABC):
+    name = "llm"
+    supports_json = False
+
+    @abstractmethod
+    def complete(self, prompt, timeout, dish_name="", json_mode=False):
+        ...
+
+    def stream(self, prompt, timeout, dish_name="", json_mode=False):
+        yield self.complete(prompt, timeout, dish_name, json_mode)
+
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+    supports_json = True
+
+    def __init__(self, api_key=None, model_name="gemini-1.5-flash", transport="rest"):
+        self.model = llm_clients.gemini_model(api_key or os.environ.get("GOOGLE_API_KEY"), model_name, transport)
+
+    def complete(self, prompt, timeout, dish_name="", json_mode=False):
+        return self.model.generate(prompt, timeout, recipe_parser.RECIPE_JSON_SCHEMA if json_mode else None)
+
+    def stream(self, prompt, timeout, dish_name="", json_mode=False):
+        yield from self.model.stream(prompt, timeout, recipe_parser.RECIPE_JSON_SCHEMA if json_mode else None)
+
+
+# response_format={"type": "json_object"} is rejected by the original gpt-4
+OPENAI_JSON_MODELS = ("gpt-4o", "gpt-4-turbo", "gpt-4.1", "gpt-3.5-turbo")
+
+
+class OpenAIProvider(LLMProvider):
+    name = "openai"
+
+    def __init__(self, api_key=None, model="gpt-4", temperature=0.2):
+        self.api_key = api_key
+        self.model = model
+        self.temperature = temperature
+        self.supports_json = model.startswith(OPENAI_JSON_MODELS)
+
+    def complete(self, prompt, timeout, dish_name="", json_mode=False):
+        extra = {"response_format": {"type": "json_object"}} if json_mode else {}
+        return llm_clients.openai_chat(
+            [{"role": "user", "content": prompt}],
+            model=self.model, temperature=self.temperature, api_key=self.api_key, timeout=timeout, **extra,
+        )
+
+
+# --- Offline Stub ---
+# Ingredients are picked by a hash of the dish name, so the same dish always
+# gets the same answer while different dishes exercise different SKUs (the
+# last two never match the catalog).
+STUB_INGREDIENTS = [
+    ("Toor Dal", "50 g", "body of the dish"),
+    ("Moong Dal", "40 g", "protein"),
+    ("Ponni Rice Raw", "80 g", "base"),
+    ("Ragi Flour", "60 g", "base"),
+    ("Cold Pressed Sesame Oil", "10 ml", "tempering"),
+    ("Cold Pressed Coconut Oil", "10 ml", "tempering"),
+    ("Mustard", "2 g", "tempering"),
+    ("Cumin", "2 g", "flavour"),
+    ("Turmeric", "1 g", "colour"),
+    ("Dry Red Chilli", "2 g", "heat"),
+    ("Black Pepper", "2 g", "heat"),
+    ("Hing Asafoetida", "0.5 g", "digestion"),
+    ("Jaggery", "20 g", "sweetness"),
+    ("Curry Leaves", "2 g", "aroma"),
+    ("Tamarind", "10 g", "sourness"),
+]
+
+STUB_TEMPLATES = {
+    # app2.py: JSON ingredient array followed by emoji sections
+    "chef-json": (
+        "{ingredients_json}\n\n"
+        "🍃 Recipe Name: {title}\n"
+        "🍽️ Standard Portion Assumed (Per Person): 250 g cooked, about 320 kcal\n"
+        "🌿 Organic Grocery Required (Per Person): {names}\n"
+        "🥗 Suitable Accompaniment (if any): Not applicable\n"
+        "🧾 Preparation Steps: {steps}\n"
+    ),
+    # working gemini 12.52.py: emoji sections with an ingredient list
+    "chef-sections": (
+        "🍃 Recipe Name: {title}\n"
+        "🍽️ Standard Portion Assumed (Per Person): 250 g cooked, about 320 kcal\n"
+        "🧂 Ingredients (with unit quantity):\n{ingredient_lines}\n"
+        "🌿 Organic Grocery Required (Per Person): {names}\n"
+        "🥗 Suitable Accompaniment (if any): Not applicable\n"
+        "🧾 Preparation Steps:\n{steps}\n"
+    ),
+    # app.py / debugapp.py: the numbered 8-heading format
+    "numbered": (
+        "1. Recipe Name: {title}\n"
+        "2. Standard Portion Assumed: 250 g cooked, about 320 kcal\n"
+        "3. Ingredients:\n{sku_lines}\n"
+        "4. Organic Grocery Required: {names}\n"
+        "5. Grocery Didn’t Match: Not applicable\n"
+        "6. Suitable Accompaniment: Not applicable\n"
+        "7. Total Cost: ₹0\n"
+        "8. Response:\n{steps}\n"
+    ),
+    # recipe_engine.py: one "Field: value" line per column
+    "locked": (
+        "Recipe Name: {title}\n"
+        "Standard Portion Assumed: 250 g cooked\n"
+        "Ingredients: {names_with_qty}\n"
+        "Organic Grocery Required: {names}\n"
+        "Grocery Didn’t Match: Not applicable\n"
+        "Suitable Accompaniment: Not applicable\n"
+        "Total Cost: ₹0.00\n"
+        "Response: {steps}\n"
+    ),
+}
+
+
+@lru_cache(maxsize=None)
+def load_stub_responses(path):
+    # Optional canned answers: {"dish name": "full response text", ...}
+    if not path:
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return {key.strip().lower(): text for key, text in json.load(f).items()}
+
+
+def render_stub(dish_name, fmt):
+    seed = int(hashlib.sha1(dish_name.strip().lower().encode("utf-8")).hexdigest(), 16)
+    picked = [STUB_INGREDIENTS[(seed >> (4 * i)) % len(STUB_INGREDIENTS)] for i in range(6)]
+    picked = list(dict.fromkeys(picked))
+    title = dish_name.strip().title() or "House Special"
+    if fmt == "json":
+        # What a JSON-mode provider returns (recipe_parser.JSON_FIELDS)
+        return json.dumps({
+            "recipe_name": title,
+            "standard_portion": "250 g cooked, about 320 kcal",
+            "ingredients": [{"name": n, "quantity": q, "purpose": p} for n, q, p in picked],
+            "organic_grocery": ", ".join(n for n, _, _ in picked),
+            "unmatched_grocery": "Not applicable",
+            "accompaniment": "Not applicable",
+            "total_cost": "₹0.00",
+            "steps": [f"Wash and soak the grains and dals for {title}.", "Temper in oil and cook until done.",
+                      "Serve warm."],
+        }, ensure_ascii=False, indent=2)
+    return STUB_TEMPLATES[fmt].format(
+        title=title,
+        ingredients_json=json.dumps([{"name": n, "quantity": q, "purpose": p} for n, q, p in picked]),
+        ingredient_lines="\n".join(f"{q} {n}" for n, q, _ in picked),
+        sku_lines="\n".join(f"• {n} - {q}" for n, q, _ in picked),
+        names=", ".join(n for n, _, _ in picked),
+        names_with_qty=", ".join(f"{n} {q}" for n, q, _ in picked),
+        steps=f"1. Wash and soak the grains and dals for {title}. 2. Temper in oil and cook until done. 3. Serve warm.",
+    )
+
+
+class StubProvider(LLMProvider):
+    name = "stub"
+    supports_json = True
+
+    def __init__(self, fmt="chef-json", latency=None, chunk_delay=None, responses_file=None):
+        self.fmt = fmt
+        self.latency = STUB_LATENCY if latency is None else latency
+        self.chunk_delay = STUB_CHUNK_DELAY if chunk_delay is None else chunk_delay
+        self.responses = load_stub_responses(responses_file or STUB_RESPONSES_FILE)
+
+    def _wait(self, seconds, timeout):
+        # Latency past the caller's timeout behaves like a hung request
+        if seconds >= timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"stub response exceeded the {timeout:.1f}s timeout")
+        time.sleep(seconds)
+
+    def _text(self, dish_name, json_mode=False):
+        canned = self.responses.get(dish_name.strip().lower())
+        return canned or render_stub(dish_name, "json" if json_mode else self.fmt)
+
+    def complete(self, prompt, timeout, dish_name="", json_mode=False):
+        self._wait(self.latency, timeout)
+        return self._text(dish_name, json_mode)
+
+    def stream(self, prompt, timeout, dish_name="", json_mode=False):
+        self._wait(self.latency, timeout)
+        text = self._text(dish_name, json_mode)
+        for start in range(0, len(text), STUB_CHUNK_SIZE):
+            if start and self.chunk_delay:
+                time.sleep(self.chunk_delay)
+            yield text[start:start + STUB_CHUNK_SIZE]
+
+
+ADAPTERS = {"gemini": GeminiProvider, "openai": OpenAIProvider}
+
+
+def provider_kind(default):
+    return PROVIDER_OVERRIDE or default
+
+
+def get_provider(default, stub_format="chef-json", **options):
+    # options configure the default adapter; an override uses its own defaults
+    kind = provider_kind(default)
+    if kind == "stub":
+        return StubProvider(stub_format)
+    if kind not in ADAPTERS:
+        raise ValueError(f"Unknown LLM provider '{kind}' (expected gemini, openai or stub)")
+    return ADAPTERS[kind](**(options if kind == default else {}))
+
+
+def generate(provider, prompt, dish_name="", on_text=None, deadline=None, json_mode=False):
+    # Guarded by llm_guard (deadline, retries, circuit breaker per provider).
+    # With on_text, chunks are handed over as they arrive; a stream that has
+    # shown output is not retried and never returns a partial answer.
+    # json_mode is only honoured by providers that support it; the others get
+    # the prompt unchanged and answer in its text format.
+    json_mode = json_mode and JSON_MODE and provider.supports_json
+    if json_mode:
+        prompt += recipe_parser.JSON_MODE_INSTRUCTIONS
+    if on_text is None:
+        return llm_guard.call(
+            provider.name, lambda timeout: provider.complete(prompt, timeout, dish_name, json_mode), deadline
+        )
+
+    chunks = []
+
+    def stream(timeout):
+        for chunk in llm_guard.stream_until(provider.stream(prompt, timeout, dish_name, json_mode), timeout):
+            chunks.append(chunk)
+            on_text(chunk)
+        return "".join(chunks)
+
+    return llm_guard.call(provider.name, stream, deadline, retry_if=lambda: not chunks)
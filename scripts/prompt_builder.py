@@ -0,0 +1,112 @@
+# --- Imports ---
+import hashlib
+import os
+import re
+import threading
+
+# --- Prompt Compiler ---
+# The SKU/price catalog is the bulk of the Chettinad-chef prompt. It is
+# rendered once per catalog version and encoding, and the whole template is
+# pre-split around {dish_name}, so building a prompt is two concatenations.
+#   full    - the original bullet lists: approved names, then prices
+#   compact - one priced list grouped by category (names appear once);
+#             opt-in (CHEFBOT_PROMPT_CATALOG=compact) until checked against
+#             real answers, since "Name 940" lines may get echoed into
+#             ingredient names and miss the SKU match
+PROMPT_CATALOG_ENCODING = os.environ.get("CHEFBOT_PROMPT_CATALOG", "full")
+
+BANNER = "===================="
+
+CATEGORY_RULES = [
+    ("Oils & Ghee", ("oil", "ghee")),
+    ("Rice & Poha", ("rice", "poha", "aval")),
+    ("Millets & Flours", ("millet", "flour", "bajra", "jowar", "ragi", "kodo", "samai", "thinai", "adai")),
+    ("Dals & Pulses", ("dal", "gram", "chana", "moong", "rajma", "lobia", "masoor", "kulthi", "horsegram")),
+    ("Nuts, Seeds & Dry Fruits", ("almond", "cashew", "walnut", "raisin", "dates", "seed", "groundnut")),
+    ("Sweeteners", ("sugar", "jaggery", "honey", "stevia")),
+    ("Tea & Coffee", ("tea", "coffee")),
+    ("Spices & Masalas", ("masala", "pepper", "cumin", "jeera", "cardamom", "cinnamon", "clove", "coriander",
+                          "chilli", "fennel", "fenugreek", "hing", "mustard", "rasam", "anise", "turmeric",
+                          "ajwain", "bay", "sambar")),
+]
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+def categorize(sku):
+    # Keywords match at the start of a word ("oil" must not hit "Boiled")
+    words = re.findall(r"\w+", sku.lower())
+    for category, keywords in CATEGORY_RULES:
+        if any(word.startswith(keyword) for word in words for keyword in keywords):
+            return category
+    return "Others"
+
+
+def prompt_stats(text):
+    # Token count is an estimate (~1.3 tokens per word, 1 per symbol/emoji);
+    # good enough to compare prompt variants without calling the API
+    pieces = _TOKEN_PATTERN.findall(text)
+    words = sum(1 for p in pieces if p[0].isalnum() or p[0] == "_")
+    return {"chars": len(text), "est_tokens": round(words * 1.3 + (len(pieces) - words))}
+
+
+def catalog_version(skus, prices):
+    joined = "\n".join(f"{sku}\t{prices.get(sku, '')}" for sku in skus)
+    return hashlib.sha1(joined.encode("utf-8")).hexdigest()[:12]
+
+
+def _full_block(skus, prices):
+    approved_list = "\n".join(f"• {item}" for item in skus)
+    prices_text = "\n".join(f"• {item} – ₹{prices[item]}/kg or /L" for item in prices)
+    return (f"{BANNER}\n📦 APPROVED INGREDIENTS\n{BANNER}\n{approved_list}\n"
+            f"{BANNER}\n💰 INGREDIENT PRICES\n{BANNER}\n{prices_text}")
+
+
+def _compact_block(skus, prices):
+    groups = {}
+    for sku in skus:
+        price = prices.get(sku)
+        groups.setdefault(categorize(sku), []).append(f"{sku} {price}" if price else sku)
+    order = [name for name, _ in CATEGORY_RULES] + ["Others"]
+    lines = [f"{name}: " + " | ".join(groups[name]) for name in order if name in groups]
+    return (f"{BANNER}\n📦 APPROVED INGREDIENTS (₹ per kg or L; no price = free)\n{BANNER}\n"
+            + "\n".join(lines))
+
+
+class CompiledPrompt:
+    def __init__(self, template, catalog_block, version, encoding):
+        self.version = version
+        self.encoding = encoding
+        static = template.replace("{catalog}", catalog_block)
+        self._head, _, self._tail = static.partition("{dish_name}")
+        self.static_stats = prompt_stats(self._head + self._tail)
+
+    def render(self, dish_name):
+        return self._head + dish_name + self._tail
+
+    def render_with_stats(self, dish_name):
+        # Only the dish name is counted per call; the template and catalog
+        # were counted once at compile time
+        prompt = self.render(dish_name)
+        fragment = prompt_stats(dish_name)
+        return prompt, {key: self.static_stats[key] + fragment[key] for key in self.static_stats}
+
+
+_compiled = {}
+_lock = threading.Lock()
+
+
+def compile_prompt(template, skus, prices, encoding=None, version=None):
+    # version: the catalog's own tag when it has one, else a content hash
+    encoding = encoding or PROMPT_CATALOG_ENCODING
+    version = version or catalog_version(skus, prices)
+    cache_key = (hashlib.sha1(template.encode("utf-8")).hexdigest(), version, encoding)
+    compiled = _compiled.get(cache_key)
+    if compiled is None:
+        with _lock:
+            compiled = _compiled.get(cache_key)
+            if compiled is None:
+                block = _compact_block(skus, prices) if encoding == "compact" else _full_block(skus, prices)
+                compiled = CompiledPrompt(template, block, version, encoding)
+                _compiled[cache_key] = compiled
+    return compiled
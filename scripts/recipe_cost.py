@@ -0,0 +1,299 @@
+# --- Imports ---
+import re
+import threading
+
+import sku_matcher
+from catalog import Catalog
+
+# --- Recipe Costing ---
+# The two cost models the apps use, with the catalog passed in rather than
+# read from app globals, so they can be called outside Streamlit.
+#   flat:     app2.py, a tenth of the per-kg price per matched ingredient
+#   weighted: app.py, per-kg/L price times the quantity
+# Every costed recipe is also stored as ingredient rows (SKU, quantity in
+# g/ml) so a new price list re-prices the whole store in one join.
+# "50 g", "1.5 kg", "1/2 kg", "1 1/2 cups"
+QUANTITY_PATTERN = re.compile(r"(\d+(?:\.\d+)?(?:\s+\d+/\d+)?|\d+/\d+)\s*([a-zA-Z]+)")
+# g/ml per unit; spoons and cups at their usual kitchen volumes. Anything
+# else ("3 nos", "a pinch") has no weight and is stored as NULL, which the
+# weighted total leaves out.
+UNIT_FACTORS = {
+    "g": 1, "gm": 1, "gms": 1, "gram": 1, "grams": 1, "ml": 1,
+    "kg": 1000, "kgs": 1000, "l": 1000, "litre": 1000, "litres": 1000, "liter": 1000, "liters": 1000,
+    "tsp": 5, "teaspoon": 5, "teaspoons": 5, "tbsp": 15, "tablespoon": 15, "tablespoons": 15,
+    "cup": 240, "cups": 240,
+}
+COST_FORMATS = {"flat": "₹ {}", "weighted": "₹{:.2f}"}
+# How each model's cost looks when stored, to tell older rows apart
+COST_PATTERNS = {"flat": re.compile(r"^₹ \d"), "weighted": re.compile(r"^₹\d+\.\d{2}$")}
+# Where a stored recipe keeps the ingredient lines its cost was computed from
+COST_SOURCES = {"flat": "Ingredients_(with_unit_quantity)", "weighted": "Organic_Grocery_Required_(Per_Person)"}
+FLAT_LINE = re.compile(
+    r"^[-•\s]*(?:\d+(?:[./]\d+)?\s*(?:kg|g|gm|gms|grams?|ml|l|litres?|tsp|tbsp|cups?|pinch|nos?|pcs?)?\.?\s+)?"
+    r"(.*?)\s*(?:\(.*\))?$",
+    re.IGNORECASE,
+)
+
+
+def _number(text):
+    # "2", "1.5", "1/2", "1 1/2"
+    total = 0.0
+    for part in text.split():
+        if "/" in part:
+            numerator, denominator = part.split("/")
+            if float(denominator) == 0:
+                return None
+            total += float(numerator) / float(denominator)
+        else:
+            total += float(part)
+    return total
+
+
+def quantity_gml(text):
+    # "50 g" -> 50.0, "1/2 kg" -> 500.0, "1 tsp" -> 5.0; None for units
+    # with no known weight
+    match = QUANTITY_PATTERN.search(str(text or ""))
+    if not match:
+        return None
+    factor = UNIT_FACTORS.get(match[2].lower())
+    qty = _number(match[1])
+    return None if factor is None or qty is None else qty * factor
+
+
+def ingredient_items(text):
+    # recipe_engine.py: free-text ingredients ("toor dal 100 g, ghee 10 g",
+    # "- 100 g toor dal (base)", "Toor dal - 100 g") as price_json input
+    lines = [line for line in str(text or "").splitlines() if line.strip()]
+    if len(lines) == 1:
+        lines = lines[0].split(",")
+    items = []
+    for line in lines:
+        line = re.sub(r"\s*\(.*\)\s*$", "", line.strip().lstrip("-•* ").strip())
+        if " - " in line or ":" in line:
+            name, quantity = map(str.strip, re.split(r" - |:", line, maxsplit=1))
+        else:
+            match = QUANTITY_PATTERN.search(line)
+            quantity = match[0] if match else ""
+            name = (line[:match.start()] + line[match.end():]).strip() if match else line
+        if name:
+            items.append({"name": name, "quantity": quantity})
+    return items
+
+
+def cost_fields(model, cost, rows):
+    # Extra keys for recipe_store.append: stored as ingredient rows, not JSON
+    return {"__cost_model": model, "__cost": round(cost, 2), "__ingredient_rows": rows}
+
+
+def price_json(ingredients_json, skus, prices, db_path=sku_matcher.SKU_CACHE_FILE, fingerprint=None):
+    # app2.py: (total, unmatched names, [(sku, quantity), ...]);
+    # prices are keyed by lowercased SKU name. fingerprint: the catalog's,
+    # so the SKU list is not hashed again on every call
+    unmatched, rows = [], []
+    total_cost = 0.0
+
+    # Resolve the whole ingredient list at once (cached on disk, fuzzy-matched on a miss)
+    raw_names = [item["name"].strip().lower() for item in ingredients_json]
+    matches = sku_matcher.get_resolver(skus, db_path, fingerprint=fingerprint).resolve_many(raw_names)
+
+    for item, raw_name in zip(ingredients_json, raw_names):
+        match = matches[raw_name]
+        if match:
+            matched_sku, score = match
+            unit_price = prices.get(matched_sku, 0)
+            total_cost += unit_price / 10  # crude estimate per person
+            rows.append((matched_sku, quantity_gml(item.get("quantity"))))
+            print(f"[MATCHED] {raw_name} → {matched_sku} ({score}) → ₹{unit_price}")
+        else:
+            unmatched.append(raw_name)
+            print(f"[UNMATCHED] {raw_name}")
+
+    return total_cost, unmatched, rows
+
+
+def compute_cost(ingredients_json, skus, prices, db_path=sku_matcher.SKU_CACHE_FILE, fingerprint=None):
+    total_cost, unmatched, _ = price_json(ingredients_json, skus, prices, db_path, fingerprint)
+    return total_cost, unmatched
+
+
+def match_skus(ingredient_lines, skus, db_path=sku_matcher.SKU_CACHE_FILE, fingerprint=None):
+    # app.py: "<name> - <qty>" lines, rewritten to the catalog spelling
+    matched, unmatched = [], []
+    names = [line.split("-")[0].strip() if "-" in line else line.strip() for line in ingredient_lines]
+    resolved = sku_matcher.get_resolver(skus, db_path, fingerprint=fingerprint).resolve_many(names)
+    sku_names = {sku.lower(): sku for sku in skus}
+    for line, name in zip(ingredient_lines, names):
+        match = resolved[name]
+        if match:
+            # Rewrite to the catalog spelling so calculate_cost finds the price
+            qty = line.split("-", 1)[1].strip() if "-" in line else ""
+            matched.append(f"{sku_names[match[0]]} - {qty}" if qty else sku_names[match[0]])
+        else:
+            unmatched.append(line)
+    return matched, unmatched
+
+
+def weighted_rows(matched_lines):
+    # "<catalog SKU> - <qty>" lines -> [(sku, quantity), ...]
+    rows = []
+    for line in matched_lines:
+        if "-" not in line:
+            continue
+        name, qty_unit = map(str.strip, line.split("-", 1))
+        quantity = quantity_gml(qty_unit)
+        if quantity is not None:
+            rows.append((name.lower(), quantity))
+    return rows
+
+
+def calculate_cost(matched_lines, prices):
+    # app.py: quantity-weighted, prices per kg/L keyed by catalog spelling
+    total = total_weighted(weighted_rows(matched_lines), prices)
+    return COST_FORMATS["weighted"].format(total)
+
+
+def total_weighted(rows, prices):
+    normalized = {k.strip().lower(): v for k, v in prices.items()}
+    return sum(normalized.get(sku, 0) / 1000 * quantity for sku, quantity in rows)
+
+
+# --- Re-pricing the Store ---
+class IngredientTable:
+    # The ingredient rows of one cost model as arrays, kept per process and
+    # extended with newly stored recipes only. `costs` holds each recipe's
+    # stored cost as of loading or of this process's last re-price.
+    def __init__(self):
+        import numpy as np
+        import pandas as pd
+
+        self.last_id = 0
+        self.df = pd.DataFrame(columns=["recipe_id", "sku", "quantity"])
+        self.recipe_codes, self.recipe_ids = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        self.sku_codes, self.skus = np.empty(0, dtype=np.int64), []
+        self.quantity = np.empty(0)
+        self.costs = np.empty(0)
+
+    def refresh(self, store, model):
+        import numpy as np
+        import pandas as pd
+
+        new = store.ingredient_frame(model, since_id=self.last_id)
+        if new.empty:
+            return self
+        # Rows come ordered by recipe id, so recipe_ids stays sorted
+        ids = new["recipe_id"].to_numpy(dtype=np.int64)
+        first = np.r_[0, np.flatnonzero(np.diff(ids)) + 1]
+        self.costs = np.concatenate([self.costs, new["cost"].to_numpy(dtype=float)[first]])
+        self.df = pd.concat([self.df, new[["recipe_id", "sku", "quantity"]]], ignore_index=True)
+        self.last_id = int(ids[-1])
+        self.recipe_codes, self.recipe_ids = pd.factorize(self.df["recipe_id"].to_numpy(dtype=np.int64))
+        self.sku_codes, self.skus = pd.factorize(self.df["sku"].to_numpy(dtype=object))
+        self.quantity = self.df["quantity"].to_numpy(dtype=float, na_value=0.0)
+        return self
+
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def ingredient_table(store, model):
+    with _tables_lock:
+        table = _tables.setdefault((store.db_path, model), IngredientTable())
+        return table.refresh(store, model)
+
+
+def reprice(store, prices, model):
+    # Recomputes every recipe costed with `model` against `prices` (a Catalog
+    # or {sku: price per kg/L}) in one vectorized pass over the ingredient
+    # rows, then rewrites only the costs that moved. Returns the number updated.
+    import numpy as np
+
+    table = ingredient_table(store, model)
+    if not len(table.recipe_ids):
+        return 0
+    if not isinstance(prices, Catalog):
+        prices = Catalog.from_prices(prices)
+    price = prices.price_vector(table.skus)[table.sku_codes]
+    line_cost = price / 10 if model == "flat" else price * table.quantity / 1000
+    totals = np.bincount(table.recipe_codes, weights=line_cost, minlength=len(table.recipe_ids)).round(2)
+
+    moved = ~np.isclose(table.costs, totals)
+    if not moved.any():
+        return 0
+    text = COST_FORMATS[model]
+    updated = store.update_costs([
+        (int(recipe_id), float(cost), text.format(float(cost)))
+        for recipe_id, cost in zip(table.recipe_ids[moved], totals[moved])
+    ])
+    table.costs = totals
+    return updated
+
+
+def _source_rows(record, model, names):
+    # Ingredient (name, quantity) pairs from a recipe saved as text only
+    pairs = []
+    for line in str(record.get(COST_SOURCES[model], "")).splitlines():
+        line = line.strip()
+        if model == "weighted":
+            if "-" in line:
+                name, qty_unit = map(str.strip, line.split("-", 1))
+                pairs.append((name.lower(), quantity_gml(qty_unit)))
+        elif line:
+            name = FLAT_LINE.match(line)[1].strip().lower()
+            if name:
+                pairs.append((name, quantity_gml(line)))
+    names.update(name for name, _ in pairs)
+    return pairs
+
+
+def backfill_ingredients(store, skus, model, db_path=sku_matcher.SKU_CACHE_FILE, fingerprint=None):
+    # One-time migration of recipes stored before ingredient rows existed.
+    # A row belongs to the model whose cost format it carries; rows matching
+    # no model (or with nothing to price) are marked so they are not re-read.
+    pending, unpriceable, names = [], [], set()
+    for recipe_id, record in store.unpriced():
+        cost_text = str(record.get("Total_Cost_(₹_Per_Person)", "")).strip()
+        owner = next((m for m, pattern in COST_PATTERNS.items() if pattern.match(cost_text)), None)
+        if owner is None:
+            unpriceable.append((recipe_id, "", None, []))
+        elif owner == model:
+            pending.append((recipe_id, _source_rows(record, model, names)))
+
+    resolved = sku_matcher.get_resolver(skus, db_path, fingerprint=fingerprint).resolve_many(sorted(names))
+    priced = list(unpriceable)
+    for recipe_id, pairs in pending:
+        rows = [(resolved[name][0], quantity) for name, quantity in pairs if resolved.get(name)]
+        priced.append((recipe_id, model, None, rows) if rows else (recipe_id, "", None, []))
+    if pending:
+        # Older recipe ids gained rows; the cached table only grows at the end
+        with _tables_lock:
+            _tables.pop((store.db_path, model), None)
+    store.set_ingredients(priced)
+    return sum(1 for _, owner, _, _ in priced if owner == model)
+
+
+_priced = {}
+_priced_lock = threading.Lock()
+
+
+def ensure_priced(store, catalog, model, db_path=sku_matcher.SKU_CACHE_FILE):
+    # Called by the apps on every rerun; the work only happens once per
+    # process and catalog version. Returns the number of recipes re-priced.
+    cache_key, version = (store.db_path, model), catalog.tag
+    if _priced.get(cache_key) == version:
+        return 0
+    with _priced_lock:
+        if _priced.get(cache_key) == version:
+            return 0
+        if model == "weighted":
+            # Quantities stored before quantity_gml knew its units (every
+            # unknown unit counted as 1000 g) are derived again
+            store.reset_ingredients(model, "weighted_quantities_v2")
+            with _tables_lock:
+                _tables.pop((store.db_path, model), None)
+        migrated = backfill_ingredients(store, catalog.normalized, model, db_path, catalog.fingerprint)
+        updated = reprice(store, catalog, model)
+        _priced[cache_key] = version
+    if migrated or updated:
+        print(f"[PRICES] {model}: {migrated} recipes migrated to ingredient rows, {updated} costs updated")
+    return updated
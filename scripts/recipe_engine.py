@@ -1,33 +1,26 @@
-import openai
-import pandas as pd
+import argparse
 import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 
-# Path to the Excel file (relative to this script's location)
-EXCEL_FILE = os.path.join(os.path.dirname(__file__), '../data/Recipebase.xlsx')
+import catalog
+import llm_providers
+import recipe_cost
+import recipe_parser
+import recipe_quality
+import recipe_store
+import turn_metrics
+from recipe_store import RECIPE_COLUMNS
 
-def get_locked_recipe(dish_name):
-    # Try to load existing Excel file or create new DataFrame if not found
-    try:
-        df = pd.read_excel(EXCEL_FILE)
-    except FileNotFoundError:
-        df = pd.DataFrame(columns=[
-            "Recipe_Name",
-            "Standard_Portion_Assumed_(Per_Person)",
-            "Ingredients_(with_unit_quantity)",
-            "Organic_Grocery_Required_(Per_Person)",
-            "Grocery_Didn’t_Match_(if_any)",
-            "Suitable_Accompaniment_(if_any)",
-            "Total_Cost_(₹_Per_Person)",
-            "Response"
-        ])
-
-    # Check if the recipe already exists in memory
-    if dish_name in df["Recipe_Name"].values:
-        result = df[df["Recipe_Name"] == dish_name]
-        return result.to_string(index=False)
+# Recipe store shared with the Streamlit apps (Excel is an export of it)
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+DB_FILE = os.path.join(DATA_DIR, 'Recipebase.db')
+EXCEL_FILE = os.path.join(DATA_DIR, 'Recipebase.xlsx')
 
+def build_prompt(dish_name):
     # Prompt to get all 8 fields from GPT
-    prompt = f"""You are a 60+ year Chettinad culinary and preventive health expert.
+    return f"""You are a 60+ year Chettinad culinary and preventive health expert.
 
 Dish Name: {dish_name}
 
@@ -46,28 +39,180 @@ Ensure:
 - Same ingredients and prices must be used every time
 - No synonyms or variations allowed in the first 7 fields once it's saved"""
 
-    # Call OpenAI API
-    response = openai.ChatCompletion.create(
-        model="gpt-4",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.2
-    )["choices"][0]["message"]["content"]
-
-    print("\nGenerated Response:\n")
-    print(response)
+def ask_openai(prompt, dish_name=""):
+    # OpenAI unless CHEFBOT_LLM_PROVIDER says otherwise (client and HTTP
+    # session are reused; deadline, retries and circuit breaking included)
+    provider = llm_providers.get_provider("openai", stub_format="locked", model="gpt-4", temperature=0.2)
+    return llm_providers.generate(provider, prompt, dish_name, json_mode=True)
 
-    # Split the 8 responses
-    lines = response.strip().split("\n")
-    values = [line.split(":", 1)[1].strip() if ":" in line else "" for line in lines[:8]]
-    if len(values) < 8:
+def parse_locked_response(response):
+    # Fields by their labels (or a JSON-mode object); an answer with no
+    # recognizable labels falls back to the old positional split of 8 lines
+    result = recipe_parser.parse_response(response, expected=RECIPE_COLUMNS)
+    if result.mode == "text" and not result.fields:
+        lines = response.strip().split("\n")
+        values = [line.split(":", 1)[1].strip() if ":" in line else "" for line in lines[:8]]
         values += [""] * (8 - len(values))
+        return dict(zip(RECIPE_COLUMNS, values))
+    if result.missing:
+        print(f"[PARSE] Answer is missing: {', '.join(result.missing)}")
+    return {col: result.fields.get(col, "") for col in RECIPE_COLUMNS}
+
+def price_row(row):
+    # Priced against the full catalog with the flat model, like app2.py, so
+    # recipe_service.load_memory re-prices these rows with the others
+    full = catalog.get("full")
+    items = recipe_cost.ingredient_items(row["Ingredients_(with_unit_quantity)"])
+    cost, unmatched, ingredient_rows = recipe_cost.price_json(
+        items, full.normalized, full.normalized_prices, fingerprint=full.fingerprint
+    )
+    row["Grocery_Didn’t_Match_(if_any)"] = ", ".join(unmatched) or "Not applicable"
+    row["Total_Cost_(₹_Per_Person)"] = recipe_cost.COST_FORMATS["flat"].format(round(cost, 2))
+    row.update(recipe_cost.cost_fields("flat", cost, ingredient_rows))
+    return row
+
+def check_row(dish_name, row):
+    # Incomplete or implausibly priced answers are never saved
+    problems = recipe_quality.stored_issues(row, check_cost=True)
+    if problems:
+        print(f"[QUALITY] {dish_name}: not saved ({', '.join(problems)})")
+        raise recipe_quality.RecipeRejected(f"incomplete answer: {', '.join(problems)}")
+    return row
+
+def get_locked_recipe(dish_name):
+    # Timed per stage into the shared metrics file (python turn_metrics.py --source engine)
+    with turn_metrics.turn("engine", dish_name) as engine_turn:
+        with engine_turn.span("load_memory"):
+            store = recipe_store.get_store(DB_FILE, EXCEL_FILE)
+        key = recipe_store.lookup_key(dish_name)
+
+        # Check if the recipe already exists in memory, under this or any
+        # other spelling of the dish
+        with engine_turn.span("lookup"):
+            existing = store.find(key)
+            if existing is None:
+                existing = store.find_alias(dish_name)
+        if existing is not None:
+            engine_turn.outcome = "memory"
+            return "\n".join([f"{col}: {existing.get(col, '')}" for col in RECIPE_COLUMNS])
+
+        with engine_turn.span("llm"):
+            response = ask_openai(build_prompt(dish_name), dish_name)
+
+        print("\nGenerated Response:\n")
+        print(response)
+
+        with engine_turn.span("parse"):
+            row = parse_locked_response(response)
+        with engine_turn.span("sku_match"):
+            price_row(row)
+        try:
+            check_row(dish_name, row)
+        except recipe_quality.RecipeRejected as e:
+            engine_turn.outcome = "rejected"
+            return f"Not saved: {e}"
+
+        # Append new row to the recipe store
+        with engine_turn.span("save"):
+            store.append(row, key=key)
+        engine_turn.outcome = "generated"
 
-    # Add new row to Excel
-    df.loc[len(df.index)] = values
-    df.to_excel(EXCEL_FILE, index=False)
+        return "\n".join([f"{col}: {row.get(col, '')}" for col in RECIPE_COLUMNS])
 
-    return "\n".join([f"{col}: {val}" for col, val in zip(df.columns, values)])
+# --- Batch Pre-generation ---
+def read_dish_file(path):
+    # One dish per line; blank lines and "#" comments are skipped, repeats dropped
+    seen, dishes = set(), []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            dish = line.strip()
+            key = recipe_store.lookup_key(dish)
+            if dish and not dish.startswith("#") and key not in seen:
+                seen.add(key)
+                dishes.append(dish)
+    return dishes
+
+def generate_row(dish_name):
+    # A rejected answer fails the dish, so it lands in the .failed file
+    row = price_row(parse_locked_response(ask_openai(build_prompt(dish_name), dish_name)))
+    return check_row(dish_name, row)
+
+def batch_generate(path, workers=4, chunk_size=25, failed_path=None):
+    store = recipe_store.get_store(DB_FILE, EXCEL_FILE)
+    dishes = read_dish_file(path)
+
+    # Resume: anything already in the store is skipped, so a rerun after an
+    # interruption only generates what is still missing
+    stored = store.existing_keys([recipe_store.lookup_key(d) for d in dishes])
+    todo = [d for d in dishes if recipe_store.lookup_key(d) not in stored]
+    print(f"{len(dishes)} dishes, {len(dishes) - len(todo)} already stored, {len(todo)} to generate "
+          f"with {workers} workers")
+
+    failed_path = failed_path or f"{path}.failed"
+    pending_rows, pending_keys, failed = [], [], []
+    done, saved, started = 0, 0, time.time()
+
+    def flush():
+        nonlocal saved
+        if pending_rows:
+            store.append_many(pending_rows, pending_keys)
+            saved += len(pending_rows)
+            pending_rows.clear()
+            pending_keys.clear()
+
+    def collect(future, dish):
+        nonlocal done
+        done += 1
+        try:
+            pending_rows.append(future.result())
+            pending_keys.append(recipe_store.lookup_key(dish))
+            status = "✓"
+        except Exception as e:
+            failed.append(dish)
+            status = f"✗ {e}"
+        elapsed = time.time() - started
+        print(f"[{done}/{len(todo)}] {dish} {status} ({elapsed:.0f}s elapsed)", flush=True)
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures, collected = {}, set()
+    try:
+        futures = {executor.submit(generate_row, dish): dish for dish in todo}
+        for future in as_completed(futures):
+            collect(future, futures[future])
+            collected.add(future)
+            if len(pending_rows) >= chunk_size:
+                flush()
+    except KeyboardInterrupt:
+        # Queued dishes are dropped; calls already running are paid for, so
+        # they are waited for and saved too
+        print("Interrupted: finishing the calls in flight, rerun the same command to resume.", flush=True)
+        for future in futures:
+            future.cancel()
+        running = [future for future in futures if future not in collected and not future.cancelled()]
+        wait(running)
+        for future in running:
+            collect(future, futures[future])
+    finally:
+        flush()
+        executor.shutdown(wait=False)
+
+    if failed:
+        with open(failed_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(failed) + "\n")
+        print(f"{len(failed)} dishes failed; retry them with --batch {failed_path}")
+    print(f"Saved {saved} new recipes in {time.time() - started:.0f}s")
+    return saved, failed
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lifecode locked recipe generator")
+    parser.add_argument("--batch", metavar="FILE", help="pre-generate every dish listed in FILE (one per line)")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent LLM calls in batch mode")
+    parser.add_argument("--chunk", type=int, default=25, help="recipes written to the store per batch insert")
+    args = parser.parse_args()
+
+    if args.batch:
+        _, failed = batch_generate(args.batch, workers=args.workers, chunk_size=args.chunk)
+        sys.exit(1 if failed else 0)
+
     dish = input("Enter Dish Name: ")
     print(get_locked_recipe(dish))
@@ -0,0 +1,202 @@
+# --- Imports ---
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from fuzzy_index import FuzzyIndex
+from recipe_names import alias_keys
+
+# --- Shared In-Process Memory ---
+# Streamlit runs every session as a thread of the same process and keeps
+# imported modules alive across reruns, so snapshots stored here are shared
+# by all sessions. A snapshot is only refreshed when the store's revision
+# moves; plain appends are loaded incrementally, anything else reloads.
+# Within a generation the lookup indexes are append-only and shared by
+# successive snapshots: new rows extend them in place and each snapshot
+# only looks at the positions / slots it had when it was made.
+_lock = threading.Lock()
+_snapshots = {}
+
+CARD_CACHE_SIZE = int(os.environ.get("CHEFBOT_CARD_CACHE_SIZE", "2000"))
+
+
+def content_hash(values):
+    return hashlib.sha1("\x1f".join(str(v) for v in values).encode("utf-8")).hexdigest()
+
+
+# --- Rendered Card Cache ---
+# The chat card of a stored recipe, built once and reused by every session
+# until the recipe changes. Entries are keyed by (recipe id, card style) and
+# stamped with the store generation they were checked at: within a
+# generation a hit is a dict lookup. A generation bump (e.g. a re-price)
+# re-hashes the card's fields on the next hit and only re-renders if they
+# changed. Least recently served cards are dropped past CARD_CACHE_SIZE.
+class CardCache:
+    def __init__(self, size=CARD_CACHE_SIZE):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, generation, fields, render):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == generation:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+            return entry[2]
+        digest = content_hash(fields())
+        blob = entry[2] if entry is not None and entry[1] == digest else render()
+        with self._lock:
+            self._entries[key] = (generation, digest, blob)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return blob
+
+
+class RecipeMemory:
+    def __init__(self, df, revision, generation, cards=None, aliases=None, alias_rowid=0, indexes=None, fuzzy=None):
+        self.df = df
+        self.revision = revision
+        self.generation = generation
+        # Alias key -> recipe id (recipe_store's recipe_aliases table)
+        self.aliases = aliases if aliases is not None else {}
+        self.alias_rowid = alias_rowid
+        # Shared with the snapshots that replace this one
+        self.cards = cards if cards is not None else CardCache()
+        # column -> {value: first position}; column -> (FuzzyIndex, slots seen)
+        self._indexes = dict(indexes or {})
+        self._fuzzy = dict(fuzzy or {})
+        self._lock = threading.Lock()
+
+    def extend(self, df, revision, aliases, alias_rowid):
+        # The snapshot after an append-only change: `df` is this frame plus
+        # new rows at the end (or this very frame when only aliases moved)
+        start = len(self.df)
+        fuzzy = {}
+        with self._lock:
+            for column, index in self._indexes.items():
+                for pos, value in enumerate(df[column].iloc[start:].tolist(), start):
+                    index.setdefault(value, pos)
+            for column, (index, _) in self._fuzzy.items():
+                for pos, value in enumerate(df[column].iloc[start:].tolist(), start):
+                    index.add(value, pos)
+                fuzzy[column] = (index, len(index))
+            indexes = dict(self._indexes)
+        return RecipeMemory(df, revision, self.generation, self.cards, aliases, alias_rowid, indexes, fuzzy)
+
+    @property
+    def last_id(self):
+        if self.df.empty:
+            return 0
+        return int(self.df["__Recipe_Id"].max())
+
+    def _index(self, column):
+        index = self._indexes.get(column)
+        if index is None:
+            with self._lock:
+                index = self._indexes.get(column)
+                if index is None:
+                    index = {}
+                    for pos, value in enumerate(self.df[column].tolist()):
+                        index.setdefault(value, pos)
+                    self._indexes[column] = index
+        return index
+
+    def _fuzzy_entry(self, column):
+        entry = self._fuzzy.get(column)
+        if entry is None:
+            with self._lock:
+                entry = self._fuzzy.get(column)
+                if entry is None:
+                    index = FuzzyIndex((value, pos) for pos, value in enumerate(self.df[column].tolist()))
+                    entry = self._fuzzy[column] = (index, len(index))
+        return entry
+
+    def fuzzy_index(self, column):
+        # Builds the index if needed; it may hold rows of later snapshots,
+        # so search through search_similar()
+        return self._fuzzy_entry(column)[0]
+
+    def search_similar(self, column, value, limit=3, threshold=None):
+        # [(key, position, score), ...] among this snapshot's rows
+        if column not in self.df.columns:
+            return []
+        index, slots = self._fuzzy_entry(column)
+        if threshold is None:
+            return index.search(value, limit=limit, upto=slots)
+        return index.search(value, limit=limit, threshold=threshold, upto=slots)
+
+    def find_similar(self, column, value, threshold=None):
+        # Returns (row, score) for the closest stored name, or None
+        hits = self.search_similar(column, value, limit=1, threshold=threshold)
+        if not hits:
+            return None
+        return self.df.iloc[hits[0][1]], hits[0][2]
+
+    def find(self, column, value):
+        if column not in self.df.columns:
+            return None
+        pos = self._index(column).get(value)
+        if pos is None or pos >= len(self.df):
+            return None
+        return self.df.iloc[pos]
+
+    def find_alias(self, name):
+        # The stored recipe any known spelling of `name` points at: one dict
+        # lookup per alias key, no transliteration beyond the memoized one
+        for key in alias_keys(name):
+            recipe_id = self.aliases.get(key)
+            if recipe_id is not None:
+                return self.find("__Recipe_Id", recipe_id)
+        return None
+
+    def card(self, row, style, render, columns):
+        # render() -> the card for a stored row; columns are the fields it uses
+        key = (int(row["__Recipe_Id"]), style)
+        return self.cards.get(key, self.generation, lambda: [row.get(col) for col in columns], render)
+
+
+def load_memory(store):
+    revision, generation = store.state()
+    memory = _snapshots.get(store.db_path)
+    if memory is not None and memory.revision == revision:
+        return memory
+
+    with _lock:
+        memory = _snapshots.get(store.db_path)
+        if memory is not None and memory.revision == revision:
+            return memory
+        if memory is not None and memory.generation == generation:
+            import pandas as pd
+
+            # New rows extend the frame and its indexes; when only aliases
+            # were added the frame and indexes are reused as they are
+            new_rows = store.load_frame(since_id=memory.last_id)
+            df = pd.concat([memory.df, new_rows], ignore_index=True) if not new_rows.empty else memory.df
+            # Aliases are never repointed, so new ones are simply added
+            aliases, new_aliases = dict(memory.aliases), store.aliases(since=memory.alias_rowid)
+            aliases.update((alias, recipe_id) for _, alias, recipe_id in new_aliases)
+            alias_rowid = new_aliases[-1][0] if new_aliases else memory.alias_rowid
+            memory = memory.extend(df, revision, aliases, alias_rowid)
+        else:
+            df = store.load_frame()
+            new_aliases = store.aliases()
+            aliases = {alias: recipe_id for _, alias, recipe_id in new_aliases}
+            alias_rowid = new_aliases[-1][0] if new_aliases else 0
+            memory = RecipeMemory(df, revision, generation, memory.cards if memory is not None else None,
+                                  aliases, alias_rowid)
+        _snapshots[store.db_path] = memory
+    return memory
+
+
+def invalidate(store=None):
+    with _lock:
+        if store is None:
+            _snapshots.clear()
+        else:
+            _snapshots.pop(store.db_path, None)
@@ -0,0 +1,37 @@
+# --- Imports ---
+import unicodedata
+from functools import lru_cache
+
+# --- Recipe Name Keys ---
+# Transliteration is the expensive part of a lookup, so user queries are
+# memoized here and stored rows carry their key in the recipe store.
+TAMIL_KEY_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=TAMIL_KEY_CACHE_SIZE)
+def tamil_key(name):
+    name = str(name or "").strip().lower()
+    try:
+        from indic_transliteration import sanscript
+        from indic_transliteration.sanscript import transliterate
+        return transliterate(name, sanscript.ITRANS, sanscript.TAMIL).strip()
+    except Exception:
+        return name
+
+
+# --- Alias Keys ---
+# One dish reaches the store as English, Tanglish or Tamil-script text.
+# Each spelling is reduced to a key that ignores case, punctuation and
+# spacing but keeps Tamil vowel signs, and is also keyed by its Tamil
+# transliteration, so "Vazhaipoo Vadai", "vazhaipoo-vadai" and
+# "வாழைப்பூ வடை" can all point at the same stored recipe.
+@lru_cache(maxsize=TAMIL_KEY_CACHE_SIZE)
+def alias_key(name):
+    text = unicodedata.normalize("NFC", str(name or "")).lower()
+    return "".join(ch for ch in text if unicodedata.category(ch)[0] not in "PSZC")
+
+
+def alias_keys(name):
+    # Every key a spelling is known by: itself and its Tamil transliteration
+    keys = [alias_key(name), alias_key(tamil_key(name))]
+    return [key for n, key in enumerate(keys) if key and key not in keys[:n]]
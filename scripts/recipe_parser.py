@@ -0,0 +1,313 @@
+# --- Imports ---
+import json
+import re
+
+# --- Recipe Fields ---
+STANDARD_PORTION_KEY = "Standard_Portion_Assumed_(Per_Person)"
+INGREDIENTS_KEY = "Ingredients_(with_unit_quantity)"
+ORGANIC_GROCERY_KEY = "Organic_Grocery_Required_(Per_Person)"
+UNMATCHED_KEY = "Grocery_Didn’t_Match_(if_any)"
+ACCOMPANIMENT_KEY = "Suitable_Accompaniment_(if_any)"
+TOTAL_COST_KEY = "Total_Cost_(₹_Per_Person)"
+STEPS_KEY = "Response"
+
+# Heading label (lowercase prefix) -> column. Every response format the
+# apps ask for uses some of these: emoji sections, "1. Recipe Name: ...",
+# plain "Field: value" lines or markdown "**Field**:" headings.
+SECTION_LABELS = [
+    ("recipe name", "Recipe_Name"),
+    ("standard portion", STANDARD_PORTION_KEY),
+    ("ingredients", INGREDIENTS_KEY),
+    ("organic grocery", ORGANIC_GROCERY_KEY),
+    ("grocery didn", UNMATCHED_KEY),
+    ("grocery not matched", UNMATCHED_KEY),
+    ("suitable accompaniment", ACCOMPANIMENT_KEY),
+    ("accompaniment", ACCOMPANIMENT_KEY),
+    ("total cost", TOTAL_COST_KEY),
+    ("estimated cost", TOTAL_COST_KEY),
+    ("preparation steps", STEPS_KEY),
+    ("steps", STEPS_KEY),
+    ("response", STEPS_KEY),
+]
+_LABEL_KEYS = dict(SECTION_LABELS)
+
+# One pattern for every heading style: optional emoji/bullets/markdown,
+# optional "3." numbering, a known label, up to 60 chars of qualifier such
+# as "(Per Person)", then the colon. Labels only count at the start of a
+# line, so "2. Add the ingredients:" inside the steps is not a heading.
+HEADING_PATTERN = re.compile(
+    r"^\s*(?:[^\w\s\[{]+\s*)*(?:\d{1,2}[.)]\s*)?[*_]*("
+    + "|".join(re.escape(label) for label, _ in SECTION_LABELS)
+    + r")\b[^:\n]{0,60}?:[*\s]*(.*)$",
+    re.IGNORECASE,
+)
+# An array of objects anywhere in the text, e.g. "🥕 Ingredients: [ {...} ]"
+ARRAY_START = re.compile(r"\[\s*\{")
+BRACKETS = re.compile(r"[\[\]]")
+CODE_FENCE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$")
+
+# --- JSON Response Mode ---
+# Providers with a JSON output mode are asked for one object with these
+# keys; the parser recognizes such an answer and maps it onto the columns.
+JSON_FIELDS = [
+    ("recipe_name", "Recipe_Name", "string", "traditional Tamil recipe name"),
+    ("standard_portion", STANDARD_PORTION_KEY, "string", "portion per person: cooked yield, calories, quantity"),
+    ("ingredients", INGREDIENTS_KEY, "ingredients", "list of {name, quantity, purpose}, quantities only in g/ml"),
+    ("organic_grocery", ORGANIC_GROCERY_KEY, "string", "approved groceries required per person"),
+    ("unmatched_grocery", UNMATCHED_KEY, "string", "groceries not in the approved list, or \"Not applicable\""),
+    ("accompaniment", ACCOMPANIMENT_KEY, "string", "suitable accompaniment, or \"Not applicable\""),
+    ("total_cost", TOTAL_COST_KEY, "string", "total cost in ₹ per person"),
+    ("steps", STEPS_KEY, "steps", "list of preparation steps"),
+]
+_JSON_TYPES = {
+    "string": {"type": "string"},
+    "steps": {"type": "array", "items": {"type": "string"}},
+    "ingredients": {"type": "array", "items": {"type": "object", "properties": {
+        "name": {"type": "string"}, "quantity": {"type": "string"}, "purpose": {"type": "string"},
+    }, "required": ["name", "quantity"]}},
+}
+RECIPE_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {key: _JSON_TYPES[kind] for key, _, kind, _ in JSON_FIELDS},
+    "required": [key for key, _, _, _ in JSON_FIELDS],
+}
+JSON_MODE_INSTRUCTIONS = (
+    "\n\nIgnore the layout above and return ONLY one JSON object (no markdown, no commentary) with these keys:\n"
+    + "\n".join(f"- {key}: {description}" for key, _, _, description in JSON_FIELDS)
+    + "\n"
+)
+
+DEFAULT_EXPECTED = ["Recipe_Name", STANDARD_PORTION_KEY, INGREDIENTS_KEY, STEPS_KEY]
+
+
+def format_ingredients(ingredients_json):
+    return "\n".join(
+        f"- {i.get('quantity', '')} {i.get('name', '')} ({i.get('purpose', '')})" for i in ingredients_json
+    )
+
+
+def match_heading(line):
+    # (column, text after the colon) for a heading line, else None
+    if ":" not in line:
+        return None
+    match = HEADING_PATTERN.match(line)
+    if match is None:
+        return None
+    return _LABEL_KEYS[match.group(1).lower()], match.group(2).strip()
+
+
+def _ingredient_list(value):
+    if isinstance(value, list) and all(isinstance(item, dict) for item in value):
+        return value
+    return None
+
+
+def _text_value(value):
+    if isinstance(value, list):
+        return "\n".join(f"{n}. {item}" for n, item in enumerate(value, 1))
+    return "" if value is None else str(value).strip()
+
+
+class ParseResult:
+    def __init__(self, fields, ingredients, mode, expected, broken=False):
+        # broken: an ingredient array was present but did not decode
+        self.fields = fields
+        self.ingredients = ingredients
+        self.mode = mode
+        self.broken = broken
+        self.missing = [key for key in expected if not fields.get(key)]
+        if broken and INGREDIENTS_KEY not in self.missing:
+            self.missing.append(INGREDIENTS_KEY)
+
+    @property
+    def ok(self):
+        return not self.missing
+
+
+# --- Unified Parser ---
+def _parse_json(text):
+    body = CODE_FENCE.sub("", text.strip())
+    if not body.startswith("{"):
+        return None
+    try:
+        payload = json.loads(body)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(payload, dict) or not any(key in payload for key, _, _, _ in JSON_FIELDS):
+        return None
+
+    fields, ingredients = {}, None
+    for key, column, kind, _ in JSON_FIELDS:
+        value = payload.get(key)
+        if kind == "ingredients" and _ingredient_list(value) is not None:
+            ingredients = value
+            fields[column] = format_ingredients(value)
+        else:
+            fields[column] = _text_value(value)
+    return fields, ingredients, False
+
+
+def _parse_text(text):
+    # One pass over the lines, each tried against one precompiled pattern;
+    # a JSON ingredient array is decoded in place where its line starts
+    fields, ingredients = {}, None
+    arrays = list(ARRAY_START.finditer(text))
+    for array in arrays:
+        try:
+            value, _ = json.JSONDecoder().raw_decode(text, array.start())
+        except json.JSONDecodeError:
+            continue
+        ingredients = _ingredient_list(value)
+        if ingredients is not None:
+            break
+
+    current, buffer = None, []
+    for line in text.splitlines():
+        heading = match_heading(line)
+        if heading is not None:
+            if current is not None and not fields.get(current):
+                fields[current] = "\n".join(buffer).strip()
+            current, rest = heading
+            buffer = [rest] if rest else []
+        elif current is not None:
+            buffer.append(line.strip())
+    if current is not None and not fields.get(current):
+        fields[current] = "\n".join(buffer).strip()
+
+    if ingredients is not None:
+        fields[INGREDIENTS_KEY] = format_ingredients(ingredients)
+    return fields, ingredients, bool(arrays) and ingredients is None
+
+
+def parse_response(text, expected=None):
+    # Strict JSON answers first, then the linear text pass. result.missing
+    # lists the expected columns that came back empty.
+    text = text or ""
+    parsed, mode = _parse_json(text), "json"
+    if parsed is None:
+        parsed, mode = _parse_text(text), "text"
+    fields, ingredients, broken = parsed
+    return ParseResult(fields, ingredients, mode, DEFAULT_EXPECTED if expected is None else expected, broken)
+
+
+# --- Entry Point Shapes ---
+def parse_chef_response(response_text, recipe_name, on_error=None):
+    # app2.py: the user's dish name is the title, ingredients come as JSON
+    result = parse_response(response_text, expected=[STANDARD_PORTION_KEY, INGREDIENTS_KEY, STEPS_KEY])
+    if result.broken and on_error:
+        on_error("❌ Failed to parse ingredients JSON from Gemini.")
+
+    return {
+        "Recipe_Name": recipe_name.strip().title(),
+        STANDARD_PORTION_KEY: result.fields.get(STANDARD_PORTION_KEY, ""),
+        INGREDIENTS_KEY: result.fields.get(INGREDIENTS_KEY, ""),
+        ORGANIC_GROCERY_KEY: result.fields.get(ORGANIC_GROCERY_KEY, ""),
+        ACCOMPANIMENT_KEY: result.fields.get(ACCOMPANIMENT_KEY, ""),
+        STEPS_KEY: result.fields.get(STEPS_KEY) or "Gemini failed to generate preparation steps.",
+        "__parsed_json_ingredients": result.ingredients or [],
+        "__missing_fields": result.missing,
+    }
+
+
+def parse_numbered_response(response):
+    # app.py / debugapp.py: ingredients as "<name> - <qty>" lines for SKU matching
+    result = parse_response(response)
+    fields = dict(result.fields)
+    if result.ingredients is not None:
+        fields[INGREDIENTS_KEY] = "\n".join(
+            f"• {i.get('name', '')} - {i.get('quantity', '')}" for i in result.ingredients
+        )
+    fields["__missing_fields"] = result.missing
+    return fields
+
+
+# --- Streaming Section Parser ---
+# Consumes the Gemini stream chunk by chunk (app2.py response format) and
+# reports each section as soon as it is complete, so the chat can show
+# Portion / Ingredients / Steps while the rest is still generating. Every
+# character is looked at once; the full parse still runs on the final text.
+class IncrementalRecipeParser:
+    def __init__(self):
+        self.text = ""
+        self.sections = {}
+        self.ingredients = None
+        self._line_start = 0
+        self._json_candidates = []
+        self._current = None
+        self._lines = []
+        self._loose_start = 0
+
+    def feed(self, chunk):
+        # Returns the section keys completed by this chunk
+        start = len(self.text)
+        self.text += chunk
+        completed = self._scan_json(start)
+
+        while True:
+            end = self.text.find("\n", self._line_start)
+            if end == -1:
+                break
+            completed += self._line(self.text[self._line_start:end])
+            self._line_start = end + 1
+        return completed
+
+    def close(self):
+        completed = []
+        if self._line_start < len(self.text):
+            completed += self._line(self.text[self._line_start:])
+            self._line_start = len(self.text)
+        completed += self._finish_section()
+        return completed
+
+    def pending_text(self):
+        # Text of the section still being generated, including a partial line
+        if self._current is None:
+            return self.text[self._loose_start:].strip()
+        return "\n".join(self._lines + [self.text[self._line_start:]]).strip()
+
+    def _scan_json(self, start):
+        # Every "[" is a candidate start; each "]" is tried against the open
+        # candidates, oldest first. A candidate that decodes to anything but
+        # an ingredient list (a list of strings, a bracket in prose) is
+        # dropped and the scan goes on.
+        if self.ingredients is not None:
+            return []
+        for bracket in BRACKETS.finditer(self.text, start):
+            if bracket[0] == "[":
+                self._json_candidates.append(bracket.start())
+                continue
+            for candidate in list(self._json_candidates):
+                try:
+                    value = json.loads(self.text[candidate:bracket.end()])
+                except json.JSONDecodeError:
+                    continue
+                self._json_candidates.remove(candidate)
+                if _ingredient_list(value) is None:
+                    continue
+                self.ingredients = value
+                self._json_candidates = []
+                self.sections[INGREDIENTS_KEY] = format_ingredients(value)
+                self._loose_start = bracket.end()
+                return [INGREDIENTS_KEY]
+        return []
+
+    def _line(self, line):
+        heading = match_heading(line)
+        if heading is not None:
+            completed = self._finish_section()
+            self._current, rest = heading
+            self._lines = [rest] if rest else []
+            return completed
+        if self._current is not None:
+            self._lines.append(line.rstrip())
+        return []
+
+    def _finish_section(self):
+        if self._current is None:
+            return []
+        key, self._current = self._current, None
+        if key != INGREDIENTS_KEY or self.ingredients is None:
+            self.sections[key] = "\n".join(self._lines).strip()
+        self._lines = []
+        self._loose_start = self._line_start
+        return [key]
@@ -0,0 +1,135 @@
+# --- Imports ---
+import argparse
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import llm_guard
+import recipe_parser
+
+# --- Settings ---
+FAILURE_TTL_SECONDS = float(os.environ.get("CHEFBOT_FAILURE_TTL_SECONDS", "300"))
+FAILURE_CACHE_SIZE = 1024
+MIN_INGREDIENTS = 2
+MAX_COST_PER_PERSON = float(os.environ.get("CHEFBOT_MAX_COST_PER_PERSON", "2000"))
+STEPS_PLACEHOLDER = "Gemini failed to generate preparation steps."
+COST_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+# --- Quality Gate ---
+# A generated recipe is only saved when it has its required fields, enough
+# ingredients and a plausible per-person cost; anything else would be
+# served from memory forever. A rejected answer raises RecipeRejected, an
+# LLMUnavailable, so callers fall back to memory-only serving as they do
+# for LLM outages.
+
+
+class RecipeRejected(llm_guard.LLMUnavailable):
+    def __init__(self, message, retry_in=0.0):
+        super().__init__(message)
+        self.retry_in = retry_in
+
+
+def issues(missing, ingredient_count, cost=None):
+    # Reasons not to save a generated recipe ([] = fine); cost=None skips
+    # the cost check for flows that do not price the recipe
+    found = [f"no {column}" for column in missing]
+    if ingredient_count < MIN_INGREDIENTS:
+        found.append(f"{ingredient_count} usable ingredients")
+    if cost is not None and not 0 < cost <= MAX_COST_PER_PERSON:
+        found.append(f"implausible cost ₹{cost:.2f}")
+    return found
+
+
+def _field(record, column):
+    value = record.get(column)
+    return "" if value is None or value != value else str(value).strip()
+
+
+def ingredient_count(text):
+    # One ingredient per line, or a single comma-separated line (recipe_engine.py)
+    lines = [line for line in text.splitlines() if line.strip()]
+    if len(lines) == 1:
+        lines = [part for part in lines[0].split(",") if part.strip()]
+    return len(lines)
+
+
+def stored_issues(record, check_cost=False):
+    # The same checks for a finished row, e.g. one saved before the gate
+    # existed; the cost text is only checked on request since older and
+    # LLM-priced rows often carry ₹0
+    steps = _field(record, recipe_parser.STEPS_KEY)
+    missing = [recipe_parser.STEPS_KEY] if not steps or steps == STEPS_PLACEHOLDER else []
+    cost = None
+    if check_cost:
+        number = COST_NUMBER.search(_field(record, recipe_parser.TOTAL_COST_KEY))
+        cost = float(number[0]) if number else 0.0
+    return issues(missing, ingredient_count(_field(record, recipe_parser.INGREDIENTS_KEY)), cost)
+
+
+# --- Negative Cache ---
+# Dishes whose generation just failed (LLM error or rejected answer) are
+# remembered for FAILURE_TTL_SECONDS, so retries inside that window are
+# answered from memory instead of paying for another LLM call. Process-wide
+# and shared by every session, like the single-flight registry.
+class NegativeCache:
+    def __init__(self, ttl=FAILURE_TTL_SECONDS, size=FAILURE_CACHE_SIZE):
+        self.ttl = ttl
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        # (reason, seconds until retry) while the failure is fresh, else None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, reason = entry
+            remaining = expires - time.monotonic()
+            if remaining <= 0:
+                del self._entries[key]
+                return None
+        return reason, remaining
+
+    def add(self, key, reason):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, reason)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def check(self, key, dish):
+        # Raises RecipeRejected while `key` is a fresh failure
+        failed = self.get(key)
+        if failed is not None:
+            reason, remaining = failed
+            raise RecipeRejected(f"'{dish}' failed just now ({reason}); retrying in {remaining:.0f}s", remaining)
+
+
+FAILURES = NegativeCache()
+
+
+if __name__ == "__main__":
+    import recipe_store
+
+    parser = argparse.ArgumentParser(description="List (or delete) stored recipes that fail the quality gate")
+    parser.add_argument("--cost", action="store_true", help="also flag rows whose stored cost is implausible")
+    parser.add_argument("--delete", action="store_true", help="remove them so they are generated afresh")
+    args = parser.parse_args()
+
+    store = recipe_store.get_store()
+    broken = []
+    for _, record in store.load_frame().iterrows():
+        found = stored_issues(record, check_cost=args.cost)
+        if found:
+            broken.append(int(record["__Recipe_Id"]))
+            print(f"#{record['__Recipe_Id']} {record.get('Recipe_Name', '')}: {', '.join(found)}")
+    print(f"{len(broken)} stored recipes fail the quality gate")
+    if args.delete and broken:
+        print(f"Deleted {store.delete_recipes(broken)} recipes")
@@ -0,0 +1,164 @@
+# --- Imports ---
+import os
+
+import catalog
+import fuzzy_index
+import llm_guard
+import llm_providers
+import recipe_cost
+import recipe_memory
+import recipe_parser
+import recipe_quality
+import recipe_store
+import single_flight
+import turn_metrics
+
+# --- Global Paths ---
+SCRIPT_DIR = os.path.dirname(__file__)
+DATA_DIR = os.path.join(SCRIPT_DIR, "data")
+
+EXCEL_FILE = os.path.join(DATA_DIR, "Recipebase.xlsx")
+DB_FILE = os.path.join(DATA_DIR, "Recipebase.db")
+SKU_CACHE_FILE = os.path.join(DATA_DIR, "sku_resolutions.db")
+
+# --- Chef Recipe Service ---
+# The recipe flow behind app2.py without any Streamlit in it: memory
+# lookup, Gemini generation (shared between concurrent callers), parsing,
+# flat costing and saving. app2.py drives it from the chat UI and
+# chef_api.py over HTTP. Failures are reported through on_error callbacks
+# and the usual [TAG] prints, never by touching a UI.
+COST_MODEL = "flat"
+CHEF_PROMPT = """
+You are a 60+ year Chettinad culinary expert. Provide a traditional Tamil recipe for '{recipe_name}' in the following format:
+Return the ingredients as a **JSON array** with keys: `name`, `quantity`, and `purpose`.
+Then provide rest of the recipe as:
+
+🍃 Recipe Name: <name>
+🍽️ Standard Portion Assumed (Per Person): <details>
+🌿 Organic Grocery Required (Per Person): <list>
+🥗 Suitable Accompaniment (if any): <optional>
+🧾 Preparation Steps: <steps>
+"""
+
+
+def query_key(name):
+    return name.strip().lower()
+
+
+def load_memory():
+    # Lookup keys are stored with each row, so nothing is recomputed here;
+    # stored costs are re-priced in one pass when the catalog version changes
+    store = recipe_store.get_store(DB_FILE, EXCEL_FILE)
+    recipe_cost.ensure_priced(store, catalog.get("full"), COST_MODEL, SKU_CACHE_FILE)
+    return recipe_memory.load_memory(store)
+
+
+def lookup(name, memory=None):
+    # (exact row or None, (closest row, score) or None)
+    memory = memory or load_memory()
+    key = query_key(name)
+    with turn_metrics.span("lookup"):
+        row = memory.find("__Recipe_Lookup_Key", key)
+        if row is None:
+            # Any other spelling (English, Tanglish, Tamil script) seen for the dish
+            row = memory.find_alias(name)
+        similar = memory.find_similar("__Recipe_Lookup_Key", key) if row is None else None
+    return row, similar
+
+
+def remember_alias(name, row):
+    # A query the user confirmed for a stored recipe (e.g. a fuzzy match)
+    # finds it directly next time
+    store = recipe_store.get_store(DB_FILE, EXCEL_FILE)
+    return store.add_aliases(int(row["__Recipe_Id"]), [name], source="query")
+
+
+def search(name, limit=5, threshold=0.3, memory=None):
+    # [(lookup key, score, row), ...], closest first
+    memory = memory or load_memory()
+    hits = memory.search_similar("__Recipe_Lookup_Key", name, limit=limit, threshold=threshold)
+    return [(key, score, memory.df.iloc[pos]) for key, pos, score in hits]
+
+
+def ask_chef(recipe_name, api_key=None, on_text=None):
+    if not api_key and llm_providers.provider_kind("gemini") == "gemini":
+        raise llm_guard.LLMUnavailable("Gemini API key is missing.")
+    # Gemini unless CHEFBOT_LLM_PROVIDER says otherwise; streaming, retries and
+    # deadlines are handled by llm_providers.generate
+    provider = llm_providers.get_provider(
+        "gemini", stub_format="chef-json",
+        api_key=api_key, model_name="models/gemini-1.5-flash-latest",
+    )
+    # A streamed answer keeps the text layout the live preview reads
+    prompt = CHEF_PROMPT.format(recipe_name=recipe_name)
+    return llm_providers.generate(provider, prompt, recipe_name, on_text, json_mode=on_text is None)
+
+
+def price(ingredients_json):
+    # (total, unmatched names, ingredient rows for the store)
+    full = catalog.get("full")
+    return recipe_cost.price_json(ingredients_json, full.normalized, full.normalized_prices, SKU_CACHE_FILE, full.fingerprint)
+
+
+def generate(user_input, api_key=None, on_text=None, on_error=None):
+    user_query = query_key(user_input)
+    # Another caller may have stored this dish while we were queued
+    memory = load_memory()
+    with turn_metrics.span("lookup"):
+        row = memory.find("__Recipe_Lookup_Key", user_query)
+        if row is None:
+            row = memory.find_alias(user_input)
+    if row is not None:
+        return row.to_dict()
+
+    # A dish that just failed is not sent to Gemini again until its
+    # negative-cache entry expires; an open circuit is llm_guard's business
+    failure_key = ("app2", fuzzy_index.normalize_name(user_input))
+    recipe_quality.FAILURES.check(failure_key, user_input)
+    try:
+        parsed_data = _generate_new(user_input, user_query, api_key, on_text, on_error)
+    except llm_guard.CircuitOpen:
+        raise
+    except llm_guard.LLMUnavailable as e:
+        recipe_quality.FAILURES.add(failure_key, str(e))
+        raise
+    recipe_quality.FAILURES.clear(failure_key)
+    return parsed_data
+
+
+def _generate_new(user_input, user_query, api_key, on_text, on_error):
+    # Parsing, costing and saving only run once the whole answer is in
+    with turn_metrics.span("llm"):
+        raw_response = ask_chef(user_input, api_key, on_text)
+    with turn_metrics.span("parse"):
+        parsed_data = recipe_parser.parse_chef_response(raw_response, user_input, on_error=on_error)
+    if parsed_data["__missing_fields"]:
+        print(f"[PARSE] {user_input}: Gemini answer is missing {', '.join(parsed_data['__missing_fields'])}")
+
+    with turn_metrics.span("sku_match"):
+        cost, unmatched, ingredient_rows = price(parsed_data["__parsed_json_ingredients"])
+    parsed_data["Grocery_Didn’t_Match_(if_any)"] = ", ".join(unmatched)
+    parsed_data["Total_Cost_(₹_Per_Person)"] = f"₹ {round(cost, 2)}"
+    parsed_data.update(recipe_cost.cost_fields(COST_MODEL, cost, ingredient_rows))
+    # Only complete, plausibly priced recipes are saved
+    problems = recipe_quality.issues(parsed_data["__missing_fields"], len(ingredient_rows) + len(unmatched), cost)
+    if problems:
+        print(f"[QUALITY] {user_input}: not saved ({', '.join(problems)})")
+        raise recipe_quality.RecipeRejected(f"Gemini's recipe was incomplete: {', '.join(problems)}")
+    # Append to the recipe store (Excel is exported via recipe_store.py --export)
+    try:
+        with turn_metrics.span("save"):
+            parsed_data["__Recipe_Id"] = recipe_store.get_store(DB_FILE, EXCEL_FILE).append(parsed_data, key=user_query)
+    except Exception as e:
+        print(f"[SAVE] {user_input}: {e}")
+        if on_error:
+            on_error(f"❌ Failed to save recipe: {e}")
+    return parsed_data
+
+
+def generate_shared(user_input, api_key=None, on_text=None, on_error=None):
+    # Concurrent requests for the same dish share one Gemini generation;
+    # returns (recipe, shared). "generate" includes time spent waiting.
+    flight_key = ("app2", fuzzy_index.normalize_name(user_input))
+    with turn_metrics.span("generate"):
+        return single_flight.GENERATIONS.do(flight_key, lambda: generate(user_input, api_key, on_text, on_error))
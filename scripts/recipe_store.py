@@ -0,0 +1,431 @@
+# --- Imports ---
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+from recipe_names import alias_keys, tamil_key
+
+# --- Global Paths ---
+SCRIPT_DIR = os.path.dirname(__file__)
+DATA_DIR = os.path.join(SCRIPT_DIR, "data")
+
+DB_FILE = os.path.join(DATA_DIR, "Recipebase.db")
+EXCEL_FILE = os.path.join(DATA_DIR, "Recipebase.xlsx")
+
+# --- Recipe Columns ---
+RECIPE_COLUMNS = [
+    "Recipe_Name",
+    "Standard_Portion_Assumed_(Per_Person)",
+    "Ingredients_(with_unit_quantity)",
+    "Organic_Grocery_Required_(Per_Person)",
+    "Grocery_Didn’t_Match_(if_any)",
+    "Suitable_Accompaniment_(if_any)",
+    "Total_Cost_(₹_Per_Person)",
+    "Response"
+]
+COST_PATH = '$."Total_Cost_(₹_Per_Person)"'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recipes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    lookup_key TEXT NOT NULL,
+    recipe_name TEXT NOT NULL DEFAULT '',
+    data TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_recipes_lookup_key ON recipes (lookup_key);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('revision', 0);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('excel_imported', 0);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('aliases_backfilled', 0);
+CREATE TABLE IF NOT EXISTS recipe_ingredients (
+    recipe_id INTEGER NOT NULL REFERENCES recipes (id),
+    sku TEXT NOT NULL,
+    quantity REAL
+);
+CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_recipe ON recipe_ingredients (recipe_id);
+CREATE TABLE IF NOT EXISTS recipe_aliases (
+    alias TEXT PRIMARY KEY,
+    recipe_id INTEGER NOT NULL REFERENCES recipes (id),
+    source TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+
+def lookup_key(name):
+    return str(name or "").strip().lower()
+
+
+def _clean(value):
+    # Excel hands back NaN/NaT for empty cells; keep the JSON payload plain
+    if value is None:
+        return ""
+    try:
+        if value != value:
+            return ""
+    except (TypeError, ValueError):
+        return value
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+# --- Recipe Store ---
+# Append-only SQLite store: saving a recipe is one INSERT instead of a full
+# workbook rewrite, and concurrent sessions no longer overwrite each other.
+# Recipebase.xlsx is kept as an export for the business team. pandas (and
+# the Excel engine behind it) is only imported by the methods that build
+# frames, so single-recipe reads and writes start without it.
+class RecipeStore:
+    def __init__(self, db_path=DB_FILE, excel_path=EXCEL_FILE):
+        self.db_path = db_path
+        self.excel_path = excel_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+            # First run: seed from the existing workbook, exactly once
+            with conn:
+                claimed = conn.execute(
+                    "UPDATE meta SET value = 1 WHERE key = 'excel_imported' AND value = 0"
+                ).rowcount
+            self._migrate(conn)
+        if claimed and excel_path and os.path.exists(excel_path):
+            try:
+                self.import_excel(excel_path)
+            except Exception as e:
+                # append_many inserts nothing on failure; give the claim back
+                # so the next start imports the workbook again
+                print(f"[IMPORT] {excel_path}: {e}")
+                with closing(self._connect()) as conn, conn:
+                    conn.execute("UPDATE meta SET value = 0 WHERE key = 'excel_imported'")
+        self.backfill_tamil_keys()
+        self.backfill_aliases()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @staticmethod
+    def _migrate(conn):
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(recipes)")}
+        if "tamil_key" not in columns:
+            conn.execute("ALTER TABLE recipes ADD COLUMN tamil_key TEXT")
+        # Priced recipes: which cost model their recipe_ingredients rows use
+        # and the per-person cost as a number
+        if "cost_model" not in columns:
+            conn.execute("ALTER TABLE recipes ADD COLUMN cost_model TEXT")
+        if "cost" not in columns:
+            conn.execute("ALTER TABLE recipes ADD COLUMN cost REAL")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_recipes_tamil_key ON recipes (tamil_key)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_recipes_cost ON recipes (cost_model, id, cost)")
+        conn.commit()
+
+    @staticmethod
+    def _add_aliases(conn, recipe_id, names, now):
+        # names: [(spelling, source), ...]; a spelling already claimed by
+        # another recipe keeps pointing there. Returns the number added.
+        rows = [(key, recipe_id, source, now) for name, source in names for key in alias_keys(name)]
+        before = conn.total_changes
+        conn.executemany(
+            "INSERT OR IGNORE INTO recipe_aliases (alias, recipe_id, source, created_at) VALUES (?, ?, ?, ?)", rows
+        )
+        return conn.total_changes - before
+
+    @staticmethod
+    def _bump(conn, generation=False):
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'revision'")
+        if generation:
+            conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+
+    # --- Writes ---
+    def append(self, row, key=None):
+        return self.append_many([row], [key])[0]
+
+    def append_many(self, rows, keys=None):
+        # A row priced by recipe_cost carries "__cost_model", "__cost" and
+        # "__ingredient_rows" ([(sku, quantity in g/ml), ...]); those go to
+        # their own columns and table instead of the JSON payload. The lookup
+        # key and any "__aliases" ([(spelling, source), ...], e.g. the Tamil
+        # key of the query) become aliases of the new recipe; names the LLM
+        # made up never do, a generic one would capture every variant.
+        keys = keys or [None] * len(rows)
+        now = time.time()
+        ids = []
+        with closing(self._connect()) as conn, conn:
+            for row, key in zip(rows, keys):
+                priced = row.get("__cost_model")
+                ingredients = row.get("__ingredient_rows") or []
+                cost = row.get("__cost")
+                aliases = row.get("__aliases") or []
+                row = {k: _clean(v) for k, v in row.items() if not str(k).startswith("__")}
+                name = str(row.get("Recipe_Name", ""))
+                cur = conn.execute(
+                    "INSERT INTO recipes (lookup_key, tamil_key, recipe_name, data, created_at, cost_model, cost) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key if key is not None else lookup_key(name), tamil_key(name), name,
+                     json.dumps(row, ensure_ascii=False, default=str), now, priced, cost),
+                )
+                if priced:
+                    conn.executemany(
+                        "INSERT INTO recipe_ingredients (recipe_id, sku, quantity) VALUES (?, ?, ?)",
+                        [(cur.lastrowid, sku, quantity) for sku, quantity in ingredients],
+                    )
+                key = key if key is not None else lookup_key(name)
+                self._add_aliases(conn, cur.lastrowid, [(key, "query")] + list(aliases), now)
+                ids.append(cur.lastrowid)
+            self._bump(conn)
+        return ids
+
+    def set_ingredients(self, priced):
+        # priced: [(recipe_id, cost_model, cost, [(sku, quantity), ...]), ...]
+        # for recipes stored before they had ingredient rows
+        with closing(self._connect()) as conn, conn:
+            for recipe_id, model, cost, ingredients in priced:
+                conn.execute("DELETE FROM recipe_ingredients WHERE recipe_id = ?", (recipe_id,))
+                conn.executemany(
+                    "INSERT INTO recipe_ingredients (recipe_id, sku, quantity) VALUES (?, ?, ?)",
+                    [(recipe_id, sku, quantity) for sku, quantity in ingredients],
+                )
+                conn.execute("UPDATE recipes SET cost_model = ?, cost = ? WHERE id = ?", (model, cost, recipe_id))
+        return len(priced)
+
+    def reset_ingredients(self, model, flag):
+        # Once per store (claimed through meta `flag`): drops the ingredient
+        # rows of every recipe priced with `model`, so the next
+        # recipe_cost.backfill_ingredients derives them again from the text
+        with closing(self._connect()) as conn, conn:
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES (?, 0)", (flag,))
+            if not conn.execute("UPDATE meta SET value = 1 WHERE key = ? AND value = 0", (flag,)).rowcount:
+                return 0
+            conn.execute(
+                "DELETE FROM recipe_ingredients WHERE recipe_id IN (SELECT id FROM recipes WHERE cost_model = ?)",
+                (model,),
+            )
+            return conn.execute(
+                "UPDATE recipes SET cost_model = NULL, cost = NULL WHERE cost_model = ?", (model,)
+            ).rowcount
+
+    def update_costs(self, costs):
+        # costs: [(recipe_id, cost, display text), ...]; rewrites the stored
+        # Total_Cost column in place, so memory snapshots reload in full
+        if not costs:
+            return 0
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "UPDATE recipes SET cost = ?, data = json_set(data, ?, ?) WHERE id = ?",
+                [(cost, COST_PATH, text, recipe_id) for recipe_id, cost, text in costs],
+            )
+            self._bump(conn, generation=True)
+        return len(costs)
+
+    def add_aliases(self, recipe_id, names, source="query"):
+        # More spellings for a stored recipe, e.g. a query the user confirmed
+        with closing(self._connect()) as conn, conn:
+            added = self._add_aliases(conn, recipe_id, [(name, source) for name in names], time.time())
+            if added:
+                self._bump(conn)
+        return added
+
+    def backfill_aliases(self):
+        # Recipes stored before the alias table existed, oldest first so the
+        # earliest copy of a dish stays canonical (as find() returns it).
+        # Version 1 also aliased stored and LLM-given names; those are
+        # dropped and rebuilt from the query keys.
+        with closing(self._connect()) as conn, conn:
+            claimed = conn.execute(
+                "UPDATE meta SET value = 2 WHERE key = 'aliases_backfilled' AND value < 2"
+            ).rowcount
+            if not claimed:
+                return 0
+            dropped = conn.execute("DELETE FROM recipe_aliases WHERE source IN ('name', 'llm')").rowcount
+            now, added = time.time(), 0
+            rows = conn.execute("SELECT id, lookup_key FROM recipes ORDER BY id").fetchall()
+            for recipe_id, key in rows:
+                added += self._add_aliases(conn, recipe_id, [(key, "query")], now)
+            if added or dropped:
+                self._bump(conn)
+        return added
+
+    def delete_recipes(self, ids):
+        # Maintenance only (recipe_quality.py --delete); the store is otherwise append-only
+        ids = [(int(recipe_id),) for recipe_id in ids]
+        with closing(self._connect()) as conn, conn:
+            conn.executemany("DELETE FROM recipe_ingredients WHERE recipe_id = ?", ids)
+            conn.executemany("DELETE FROM recipe_aliases WHERE recipe_id = ?", ids)
+            before = conn.total_changes
+            conn.executemany("DELETE FROM recipes WHERE id = ?", ids)
+            deleted = conn.total_changes - before
+            self._bump(conn, generation=True)
+        return deleted
+
+    def backfill_tamil_keys(self):
+        # Rows written before the column existed get their key exactly once
+        with closing(self._connect()) as conn, conn:
+            rows = conn.execute("SELECT id, recipe_name FROM recipes WHERE tamil_key IS NULL").fetchall()
+            if rows:
+                conn.executemany(
+                    "UPDATE recipes SET tamil_key = ? WHERE id = ?",
+                    [(tamil_key(name), recipe_id) for recipe_id, name in rows],
+                )
+                self._bump(conn, generation=True)
+        return len(rows)
+
+    # --- Reads ---
+    def state(self):
+        with closing(self._connect()) as conn:
+            values = dict(conn.execute("SELECT key, value FROM meta"))
+        return values["revision"], values["generation"]
+
+    def find(self, key):
+        with closing(self._connect()) as conn:
+            hit = conn.execute(
+                "SELECT id, data FROM recipes WHERE lookup_key = ? ORDER BY id LIMIT 1", (key,)
+            ).fetchone()
+        if hit is None:
+            return None
+        row = json.loads(hit[1])
+        row["__Recipe_Id"] = hit[0]
+        return row
+
+    def existing_keys(self, keys):
+        # The keys that are stored, directly or as an alias of a stored recipe
+        keys = list(keys)
+        found = set()
+        by_alias = {}
+        for key in keys:
+            for alias in alias_keys(key):
+                by_alias.setdefault(alias, key)
+        aliases = list(by_alias)
+        with closing(self._connect()) as conn:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                found.update(row[0] for row in conn.execute(
+                    f"SELECT DISTINCT lookup_key FROM recipes WHERE lookup_key IN ({marks})", chunk
+                ))
+            for start in range(0, len(aliases), 500):
+                chunk = aliases[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                found.update(by_alias[row[0]] for row in conn.execute(
+                    f"SELECT alias FROM recipe_aliases WHERE alias IN ({marks})", chunk
+                ))
+        return found
+
+    def find_alias(self, name):
+        # The recipe any spelling of this dish was stored under, or None
+        keys = alias_keys(name)
+        if not keys:
+            return None
+        with closing(self._connect()) as conn:
+            hit = conn.execute(
+                f"SELECT r.id, r.data FROM recipe_aliases a JOIN recipes r ON r.id = a.recipe_id "
+                f"WHERE a.alias IN ({','.join('?' * len(keys))}) LIMIT 1", keys
+            ).fetchone()
+        if hit is None:
+            return None
+        row = json.loads(hit[1])
+        row["__Recipe_Id"] = hit[0]
+        return row
+
+    def aliases(self, since=0):
+        # [(rowid, alias, recipe_id), ...] added after rowid `since`
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "SELECT rowid, alias, recipe_id FROM recipe_aliases WHERE rowid > ? ORDER BY rowid", (since,)
+            ).fetchall()
+
+    def unpriced(self):
+        # (id, data) of recipes with no ingredient rows yet
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT id, data FROM recipes WHERE cost_model IS NULL ORDER BY id").fetchall()
+        return [(recipe_id, json.loads(data)) for recipe_id, data in rows]
+
+    def ingredient_frame(self, cost_model, since_id=0):
+        # One row per (recipe, SKU) for the recipes priced with cost_model
+        import pandas as pd
+
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query(
+                "SELECT i.recipe_id, i.sku, i.quantity, r.cost FROM recipes r "
+                "JOIN recipe_ingredients i ON i.recipe_id = r.id "
+                "WHERE r.cost_model = ? AND r.id > ? ORDER BY i.recipe_id",
+                conn, params=(cost_model, since_id),
+            )
+
+    def load_frame(self, since_id=0):
+        import pandas as pd
+
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT id, lookup_key, tamil_key, data FROM recipes WHERE id > ? ORDER BY id", (since_id,)
+            ).fetchall()
+        records = []
+        for recipe_id, key, tamil, data in rows:
+            record = json.loads(data)
+            record["__Recipe_Id"] = recipe_id
+            record["__Recipe_Lookup_Key"] = key
+            record["__Recipe_Tamil_Key"] = tamil
+            records.append(record)
+        df = pd.DataFrame.from_records(records)
+        for col in RECIPE_COLUMNS + ["__Recipe_Id", "__Recipe_Lookup_Key", "__Recipe_Tamil_Key"]:
+            if col not in df.columns:
+                df[col] = pd.Series(dtype=object)
+        return df
+
+    # --- Excel Import / Export ---
+    def import_excel(self, path):
+        import pandas as pd
+
+        df = pd.read_excel(path)
+        rows = [row for row in df.to_dict("records") if str(_clean(row.get("Recipe_Name"))).strip()]
+        return self.append_many(rows)
+
+    def export_excel(self, path=None):
+        path = path or self.excel_path
+        df = self.load_frame()
+        extra = [c for c in df.columns if c not in RECIPE_COLUMNS and not str(c).startswith("__")]
+        df[RECIPE_COLUMNS + extra].to_excel(path, index=False)
+        return path
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(db_path=DB_FILE, excel_path=EXCEL_FILE):
+    # One store per database file for the whole process (schema checks and
+    # the first-run Excel import happen once, not on every Streamlit rerun)
+    store = _stores.get(db_path)
+    if store is None:
+        with _stores_lock:
+            store = _stores.get(db_path)
+            if store is None:
+                store = RecipeStore(db_path, excel_path)
+                _stores[db_path] = store
+    return store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lifecode recipe store maintenance")
+    parser.add_argument("--export", nargs="?", const=EXCEL_FILE, metavar="XLSX",
+                        help="write every stored recipe to an Excel workbook")
+    parser.add_argument("--import", dest="import_path", metavar="XLSX",
+                        help="append the rows of an Excel workbook to the store")
+    args = parser.parse_args()
+
+    store = get_store()
+    if args.import_path:
+        print(f"Imported {len(store.import_excel(args.import_path))} recipes from {args.import_path}")
+    if args.export:
+        print(f"Exported recipes to {store.export_excel(args.export)}")
@@ -0,0 +1,67 @@
+# --- Imports ---
+import threading
+
+# --- Single-Flight Registry ---
+# Streamlit sessions are threads of one process, so a module-level registry
+# is shared by all of them. The first caller for a key runs the work; anyone
+# asking for the same key meanwhile waits and receives the same result (or
+# the same exception) instead of starting a duplicate LLM generation. A
+# leader stopped by something other than an Exception (a Streamlit
+# stop/rerun raised from its own session's stream callback) only concerns
+# that session: its followers go round again and one of them leads.
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.aborted = False
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, timeout=None):
+        # Returns (result, shared) where shared is True for coalesced callers
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                else:
+                    call.waiters += 1
+            if leader:
+                break
+            if not call.done.wait(timeout):
+                raise TimeoutError(f"Timed out waiting for in-flight request '{key}'")
+            if call.aborted:
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        call.aborted = True
+        try:
+            call.result = fn()
+            call.aborted = False
+        except Exception as e:
+            call.error = e
+            call.aborted = False
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self):
+        with self._lock:
+            return {key: call.waiters for key, call in self._calls.items()}
+
+
+GENERATIONS = SingleFlight()
@@ -0,0 +1,282 @@
+# --- Imports ---
+import argparse
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from collections import Counter
+from difflib import SequenceMatcher
+
+from fuzzy_index import normalize_name, trigrams
+
+# --- Global Paths ---
+SCRIPT_DIR = os.path.dirname(__file__)
+DATA_DIR = os.path.join(SCRIPT_DIR, "data")
+SKU_CACHE_FILE = os.path.join(DATA_DIR, "sku_resolutions.db")
+
+# --- SKU Matching Engine ---
+# Replaces one difflib.get_close_matches scan of the whole catalog per
+# ingredient. SKU names are normalized and indexed once (character trigrams
+# and word tokens); a query only scores the few SKUs that share grams with
+# it. The score is the better of the SequenceMatcher ratio difflib uses and
+# a token Dice score, so "toor dal" still finds "toor dal arhar split".
+SKU_MATCH_CUTOFF = 0.6
+CANDIDATE_LIMIT = 12
+
+
+def _token_dice(a, b):
+    if not a or not b:
+        return 0.0
+    return 2.0 * len(a & b) / (len(a) + len(b))
+
+
+class SkuMatcher:
+    def __init__(self, skus, cutoff=SKU_MATCH_CUTOFF):
+        self.cutoff = cutoff
+        self.skus = sorted({str(sku).strip().lower() for sku in skus})
+        self._keys = [normalize_name(sku) for sku in self.skus]
+        self._tokens = [set(key.split()) for key in self._keys]
+        self._grams = []
+        self._postings = {}
+        for slot, key in enumerate(self._keys):
+            grams = trigrams(key)
+            self._grams.append(len(grams))
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(slot)
+        self._exact = {key: slot for slot, key in enumerate(self._keys)}
+
+    def _candidates(self, grams):
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+        ranked = sorted(
+            shared.items(),
+            key=lambda item: 2.0 * item[1] / (len(grams) + self._grams[item[0]]),
+            reverse=True,
+        )
+        return [slot for slot, _ in ranked[:CANDIDATE_LIMIT]]
+
+    def exact(self, name):
+        slot = self._exact.get(normalize_name(name))
+        return self.skus[slot] if slot is not None else None
+
+    def match(self, name):
+        # Returns (normalized SKU name, score) or None
+        raw = str(name or "").strip().lower()
+        key = normalize_name(raw)
+        if not key:
+            return None
+        slot = self._exact.get(key)
+        if slot is not None:
+            return self.skus[slot], 1.0
+
+        tokens = set(key.split())
+        best, best_rank = None, (self.cutoff, 0.0)
+        for slot in self._candidates(trigrams(key)):
+            dice = _token_dice(tokens, self._tokens[slot])
+            matcher = SequenceMatcher(None, raw, self.skus[slot])
+            # quick_ratio() is an upper bound on ratio(); skip hopeless SKUs
+            if max(dice, matcher.quick_ratio()) < best_rank[0]:
+                continue
+            ratio = matcher.ratio()
+            # Ties on score go to the higher difflib ratio, as difflib would pick
+            rank = (max(ratio, dice), ratio)
+            if rank >= best_rank:
+                best, best_rank = (self.skus[slot], round(rank[0], 3)), rank
+        return best
+
+    def match_many(self, names):
+        # Batched: each distinct ingredient name is scored once per call
+        results = {}
+        for name in names:
+            if name not in results:
+                results[name] = self.match(name)
+        return results
+
+
+_matchers = {}
+_matchers_lock = threading.Lock()
+
+
+def get_matcher(skus, cutoff=SKU_MATCH_CUTOFF):
+    # Built once per catalog per process, not on every Streamlit rerun
+    cache_key = (frozenset(str(sku).strip().lower() for sku in skus), cutoff)
+    matcher = _matchers.get(cache_key)
+    if matcher is None:
+        with _matchers_lock:
+            matcher = _matchers.get(cache_key)
+            if matcher is None:
+                matcher = SkuMatcher(cache_key[0], cutoff)
+                _matchers[cache_key] = matcher
+    return matcher
+
+
+# --- Resolution Cache ---
+# Ingredient names from the LLM repeat constantly ("toor dal", "gingelly oil"),
+# so each normalized name is matched once and the outcome (SKU + score, or
+# unmatched) is kept on disk. Cached rows are keyed by a fingerprint of
+# the SKU list as well as the name, so apps on different catalogs (app.py
+# on "core", app2.py on "full") share the file without clobbering each
+# other; a fingerprint no process has opened for STALE_CATALOG_DAYS is
+# dropped. Manual overrides always win and survive catalog changes.
+STALE_CATALOG_DAYS = 30
+RESOLVER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS resolutions (
+    catalog TEXT NOT NULL,
+    name TEXT NOT NULL,
+    sku TEXT,
+    score REAL,
+    PRIMARY KEY (catalog, name)
+);
+CREATE TABLE IF NOT EXISTS catalogs (
+    catalog TEXT PRIMARY KEY,
+    seen_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS overrides (
+    name TEXT PRIMARY KEY,
+    sku TEXT
+);
+"""
+
+
+def create_schema(conn):
+    # Caches written before resolutions were keyed per catalog are dropped
+    # (they are only a cache); overrides are kept
+    keys = [row[1] for row in conn.execute("PRAGMA table_info(resolutions)") if row[5]]
+    if keys == ["name"]:
+        conn.execute("DROP TABLE resolutions")
+    conn.executescript(RESOLVER_SCHEMA)
+
+
+def catalog_fingerprint(skus):
+    joined = "\n".join(sorted({str(sku).strip().lower() for sku in skus}))
+    return hashlib.sha1(joined.encode("utf-8")).hexdigest()
+
+
+class SkuResolver:
+    def __init__(self, skus, db_path=SKU_CACHE_FILE, cutoff=SKU_MATCH_CUTOFF):
+        self.matcher = get_matcher(skus, cutoff)
+        self.catalog = f"{catalog_fingerprint(skus)}:{cutoff}"
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            create_schema(conn)
+            now = time.time()
+            conn.execute("INSERT OR REPLACE INTO catalogs (catalog, seen_at) VALUES (?, ?)", (self.catalog, now))
+            stale = now - STALE_CATALOG_DAYS * 86400
+            conn.execute(
+                "DELETE FROM resolutions WHERE catalog NOT IN (SELECT catalog FROM catalogs WHERE seen_at >= ?)",
+                (stale,),
+            )
+            conn.execute("DELETE FROM catalogs WHERE seen_at < ?", (stale,))
+            self._cache = {
+                name: ((sku, score) if sku is not None else None)
+                for name, sku, score in conn.execute(
+                    "SELECT name, sku, score FROM resolutions WHERE catalog = ?", (self.catalog,)
+                )
+            }
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _override(self, overrides, key):
+        if key not in overrides:
+            return False, None
+        if overrides[key] is None:
+            return True, None
+        # An override pointing at a SKU that left the catalog is ignored
+        sku = self.matcher.exact(overrides[key])
+        return (True, (sku, 1.0)) if sku else (False, None)
+
+    def resolve_many(self, names):
+        # Overrides are re-read each call so edits made with the CLI apply
+        # to running apps without a restart (the table is tiny)
+        with closing(self._connect()) as conn:
+            overrides = dict(conn.execute("SELECT name, sku FROM overrides"))
+        results, fresh = {}, []
+        for name in names:
+            if name in results:
+                continue
+            key = normalize_name(name)
+            found, match = self._override(overrides, key)
+            if not found:
+                if key in self._cache:
+                    match = self._cache[key]
+                else:
+                    match = self.matcher.match(name) if key else None
+                    self._cache[key] = match
+                    fresh.append((key, match))
+            results[name] = match
+
+        if fresh:
+            with self._lock, closing(self._connect()) as conn, conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO resolutions (catalog, name, sku, score) VALUES (?, ?, ?, ?)",
+                    [(self.catalog, key, m[0] if m else None, m[1] if m else None) for key, m in fresh if key],
+                )
+        return results
+
+    def resolve(self, name):
+        return self.resolve_many([name])[name]
+
+    def set_override(self, name, sku):
+        # sku=None pins the ingredient as "unmatched"
+        key = normalize_name(name)
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute("INSERT OR REPLACE INTO overrides (name, sku) VALUES (?, ?)", (key, sku))
+
+    def clear_override(self, name):
+        key = normalize_name(name)
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM overrides WHERE name = ?", (key,))
+
+
+_resolvers = {}
+_resolvers_lock = threading.Lock()
+
+
+def get_resolver(skus, db_path=SKU_CACHE_FILE, cutoff=SKU_MATCH_CUTOFF, fingerprint=None):
+    # fingerprint: catalog_fingerprint(skus) when the caller already has it
+    cache_key = (fingerprint or catalog_fingerprint(skus), db_path, cutoff)
+    resolver = _resolvers.get(cache_key)
+    if resolver is None:
+        # Separate lock: SkuResolver() itself takes _matchers_lock via get_matcher
+        with _resolvers_lock:
+            resolver = _resolvers.get(cache_key)
+            if resolver is None:
+                resolver = SkuResolver(skus, db_path, cutoff)
+                _resolvers[cache_key] = resolver
+    return resolver
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage ingredient → SKU overrides")
+    parser.add_argument("--db", default=SKU_CACHE_FILE)
+    parser.add_argument("--override", nargs=2, metavar=("INGREDIENT", "SKU"),
+                        help="always resolve INGREDIENT to SKU")
+    parser.add_argument("--unmatch", metavar="INGREDIENT", help="always treat INGREDIENT as unmatched")
+    parser.add_argument("--clear", metavar="INGREDIENT", help="remove the override for INGREDIENT")
+    parser.add_argument("--list", action="store_true", help="show overrides and cached resolutions")
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(args.db) or ".", exist_ok=True)
+    with closing(sqlite3.connect(args.db)) as conn, conn:
+        create_schema(conn)
+        if args.override:
+            conn.execute("INSERT OR REPLACE INTO overrides (name, sku) VALUES (?, ?)",
+                         (normalize_name(args.override[0]), args.override[1]))
+        if args.unmatch:
+            conn.execute("INSERT OR REPLACE INTO overrides (name, sku) VALUES (?, NULL)",
+                         (normalize_name(args.unmatch),))
+        if args.clear:
+            conn.execute("DELETE FROM overrides WHERE name = ?", (normalize_name(args.clear),))
+        if args.list:
+            for name, sku in conn.execute("SELECT name, sku FROM overrides ORDER BY name"):
+                print(f"[OVERRIDE] {name} → {sku or 'unmatched'}")
+            for name, sku, score in conn.execute("SELECT DISTINCT name, sku, score FROM resolutions ORDER BY name"):
+                print(f"[CACHED] {name} → {sku or 'unmatched'}" + (f" ({score})" if sku else ""))
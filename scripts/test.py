@@ -8,6 +8,8 @@ import json
 import re
 import base64
 
+import catalog
+
 # --- Global Paths ---
 SCRIPT_DIR = os.path.dirname(__file__)
 DATA_DIR = os.path.join(SCRIPT_DIR, "data")
@@ -18,24 +20,10 @@ logo_path = os.path.join(DATA_DIR, "Lifecode_Logo.png")
 CSS_FILE = os.path.join(SCRIPT_DIR, "style.css")
 
 # --- Approved SKUs & Prices ---
-APPROVED_SKU_LIST_RAW = [
-    "Almonds (Whole)", "Sunflower Seed (Whole)", "Pumpkin Seed (Whole)",
-    "Black Raisins (Whole)", "Cashew (Whole)", "Dates (Whole)", "Raisins (Whole)",
-    "Walnut (Whole)", "Toor Dal Arhar Split", "Black Pepper (Whole)", "Turmeric",
-    "Cold Pressed Sesame Oil White", "Mustard (Whole)", "Cumin (Whole)", "Dry Red Chilli",
-    "Garlic", "Curry Leaves", "Coriander Leaves", "Salt", "Water"
-]
-APPROVED_SKU_LIST = {item.strip().lower() for item in APPROVED_SKU_LIST_RAW}
-
-PRICE_DICT = {
-    "Almonds (Whole)": 940, "Sunflower Seed (Whole)": 130, "Pumpkin Seed (Whole)": 530,
-    "Black Raisins (Whole)": 195, "Cashew (Whole)": 1000, "Dates (Whole)": 250,
-    "Raisins (Whole)": 195, "Walnut (Whole)": 1370, "Toor Dal Arhar Split": 155,
-    "Black Pepper (Whole)": 950, "Turmeric": 210, "Cold Pressed Sesame Oil White": 310,
-    "Mustard (Whole)": 120, "Cumin (Whole)": 365, "Dry Red Chilli": 320,
-    "Garlic": 0, "Curry Leaves": 0, "Coriander Leaves": 0, "Salt": 0, "Water": 0
-}
-NORMALIZED_PRICE_DICT = {k.strip().lower(): v for k, v in PRICE_DICT.items()}
+CATALOG = catalog.get("core")
+APPROVED_SKU_LIST = set(CATALOG.normalized)
+PRICE_DICT = CATALOG.prices
+NORMALIZED_PRICE_DICT = CATALOG.normalized_prices
 
 # --- Utilities ---
 def get_base64_image(path):
@@ -0,0 +1,44 @@
+import recipe_parser
+from recipe_parser import INGREDIENTS_KEY, IncrementalRecipeParser
+
+INGREDIENTS = '[{"name": "Toor Dal", "quantity": "50 g", "purpose": "base"}]'
+
+
+def feed_all(chunks):
+    parser = IncrementalRecipeParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    parser.close()
+    return parser
+
+
+def test_stream_skips_array_of_strings():
+    parser = feed_all(['["Toor dal","Tamarind"]\n', INGREDIENTS[:20], INGREDIENTS[20:] + "\n"])
+    assert parser.ingredients == [{"name": "Toor Dal", "quantity": "50 g", "purpose": "base"}]
+    assert "Toor Dal" in parser.sections[INGREDIENTS_KEY]
+
+
+def test_stream_skips_bracket_in_prose():
+    parser = feed_all(["A rich [Chettinad] gravy.\n", INGREDIENTS + "\n"])
+    assert parser.ingredients[0]["name"] == "Toor Dal"
+
+
+def test_stream_array_of_strings_alone():
+    parser = feed_all(['["Toor dal","Tamarind"]\n', "🧾 Preparation Steps: Boil.\n"])
+    assert parser.ingredients is None
+
+
+def test_inline_ingredient_array():
+    text = f"🍽️ Standard Portion Assumed (Per Person): 200 g\n🥕 Ingredients: {INGREDIENTS}\n🧾 Preparation Steps: Boil."
+    result = recipe_parser.parse_response(text)
+    assert result.ingredients[0]["name"] == "Toor Dal"
+    assert INGREDIENTS_KEY not in result.missing
+
+
+def test_broken_ingredient_array_is_missing():
+    errors = []
+    parsed = recipe_parser.parse_chef_response(
+        '🥕 Ingredients: [{"name": "Toor Dal", "quantity": }]\n🧾 Preparation Steps: Boil.', "rasam", errors.append
+    )
+    assert INGREDIENTS_KEY in parsed["__missing_fields"]
+    assert errors
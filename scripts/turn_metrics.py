@@ -0,0 +1,167 @@
+# --- Imports ---
+import argparse
+import contextlib
+import json
+import math
+import os
+import threading
+import time
+
+from llm_guard import LatencyTracker
+
+# --- Global Paths ---
+SCRIPT_DIR = os.path.dirname(__file__)
+DATA_DIR = os.path.join(SCRIPT_DIR, "data")
+METRICS_FILE = os.environ.get("CHEFBOT_METRICS_FILE", os.path.join(DATA_DIR, "metrics.jsonl"))
+METRICS_MAX_BYTES = int(os.environ.get("CHEFBOT_METRICS_MAX_BYTES", str(5 * 1024 * 1024)))
+
+# --- Per-Turn Stage Timings ---
+# A chat turn (or engine request) opens turn(); code anywhere below it in
+# the same thread wraps its work in span(stage) without passing anything
+# around. A finished turn is appended as one JSON line to METRICS_FILE,
+# which rolls over to METRICS_FILE.1 past METRICS_MAX_BYTES, and feeds the
+# in-process p50/p95/p99 per stage shown in the apps' debug panel.
+#   load_memory, lookup, llm, parse, sku_match, save, generate (incl. waits)
+_local = threading.local()
+_lock = threading.Lock()
+_trackers = {}
+
+
+class Turn:
+    def __init__(self, source, query=""):
+        self.source = source
+        self.query = query
+        self.outcome = None
+        self.spans = {}
+        self.total_ms = None
+        self._started = time.perf_counter()
+
+    @contextlib.contextmanager
+    def span(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans[stage] = self.spans.get(stage, 0.0) + (time.perf_counter() - start) * 1000
+
+    def as_record(self):
+        return {
+            "ts": round(time.time(), 3),
+            "source": self.source,
+            "query": self.query,
+            "outcome": self.outcome,
+            "total_ms": self.total_ms,
+            "spans": {stage: round(ms, 3) for stage, ms in self.spans.items()},
+        }
+
+
+def current():
+    return getattr(_local, "turn", None)
+
+
+def mark(outcome):
+    found = current()
+    if found is not None:
+        found.outcome = outcome
+
+
+def span(stage):
+    found = current()
+    return found.span(stage) if found is not None else contextlib.nullcontext()
+
+
+@contextlib.contextmanager
+def turn(source, query=""):
+    started = Turn(source, query)
+    previous, _local.turn = current(), started
+    try:
+        yield started
+    finally:
+        _local.turn = previous
+        started.total_ms = round((time.perf_counter() - started._started) * 1000, 3)
+        record(started)
+
+
+def _tracker(stage):
+    tracker = _trackers.get(stage)
+    if tracker is None:
+        with _lock:
+            tracker = _trackers.setdefault(stage, LatencyTracker())
+    return tracker
+
+
+def record(finished, path=None):
+    for stage, ms in finished.spans.items():
+        _tracker(stage).record(ms)
+    _tracker("total").record(finished.total_ms)
+
+    path = path or METRICS_FILE
+    line = json.dumps(finished.as_record(), ensure_ascii=False) + "\n"
+    try:
+        with _lock:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            if os.path.exists(path) and os.path.getsize(path) > METRICS_MAX_BYTES:
+                os.replace(path, path + ".1")
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line)
+    except OSError as e:
+        print(f"[METRICS] Could not write {path}: {e}")
+
+
+def summary():
+    # In-process percentiles (ms) per stage, over the last 500 turns each
+    return [{"stage": stage, **_trackers[stage].percentiles()} for stage in sorted(_trackers)]
+
+
+# --- Metrics File Report ---
+def read_records(path=None):
+    path = path or METRICS_FILE
+    records = []
+    for part in (path + ".1", path):
+        if os.path.exists(part):
+            with open(part, encoding="utf-8") as f:
+                records.extend(json.loads(line) for line in f if line.strip())
+    return records
+
+
+def file_summary(records, source=None):
+    samples = {}
+    for rec in records:
+        if source and rec.get("source") != source:
+            continue
+        for stage, ms in rec.get("spans", {}).items():
+            samples.setdefault(stage, []).append(ms)
+        samples.setdefault("total", []).append(rec.get("total_ms") or 0.0)
+    report = {}
+    for stage, values in sorted(samples.items()):
+        values.sort()
+        report[stage] = {"n": len(values), **{
+            f"p{p}": round(values[max(0, math.ceil(p / 100 * len(values)) - 1)], 3) for p in (50, 95, 99)
+        }}
+    return report
+
+
+def prometheus_text(report):
+    lines = ["# HELP chefbot_stage_latency_ms Chat turn stage latency in milliseconds",
+             "# TYPE chefbot_stage_latency_ms summary"]
+    for stage, row in report.items():
+        for p in (50, 95, 99):
+            lines.append(f'chefbot_stage_latency_ms{{stage="{stage}",quantile="{p / 100}"}} {row[f"p{p}"]}')
+        lines.append(f'chefbot_stage_latency_ms_count{{stage="{stage}"}} {row["n"]}')
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-stage latency report from the chat metrics file")
+    parser.add_argument("--file", default=METRICS_FILE)
+    parser.add_argument("--source", help="only turns from this entry point (app, app2, engine)")
+    parser.add_argument("--prometheus", action="store_true", help="print Prometheus text format")
+    args = parser.parse_args()
+
+    report = file_summary(read_records(args.file), args.source)
+    if args.prometheus:
+        print(prometheus_text(report), end="")
+    else:
+        print(f"{'stage':<14}{'n':>7}{'p50 ms':>12}{'p95 ms':>12}{'p99 ms':>12}")
+        for stage, row in report.items():
+            print(f"{stage:<14}{row['n']:>7}{row['p50']:>12.1f}{row['p95']:>12.1f}{row['p99']:>12.1f}")